@@ -1,24 +1,79 @@
-from fastapi import FastAPI, HTTPException, Request, Query, Header, Depends, Form
+from fastapi import FastAPI, HTTPException, Request, Response, Query, Header, Depends, Form
 from fastapi import UploadFile, File
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from database import db_connection
-import hashlib
+from starlette.concurrency import run_in_threadpool
+from anyio import to_thread
+from database import db_connection, ConnectionPerRequestMiddleware, DB_MAX_CONNECTIONS, DB_STALE_TIMEOUT
+from database import DB_HOST, DB_PORT, DB_USERNAME, DB_PASSWORD, DB_NAME
+from async_db import ThreadPoolDriver, AioMySQLDriver, AioSQLiteDriver
+from query_recorder import QueryMetrics, QueryRecorderMiddleware, query_budget
+from pagination import Page, page_params, make_page, page_query, split_page, paginate, iterate_page, next_page_cursor
+from pagination import set_next_cursor, iterate_all, NEXT_CURSOR_HEADER, DEFAULT_PAGE_SIZE
+from streaming import json_array_stream, export_response, EXPORT_FORMATS
+from projection import Projection, FieldSpec, fields_param
+from fast_json import FastJSONResponse, fast_json, dumps
+from reference_data import ReferenceData
+from catalog_cache import CatalogCache
+from conditional import ConditionalGetMiddleware, conditional_get, etag_matches
+from single_flight import SingleFlight
+from result_cache import ResultCache
 import re
 import os
 from models import Roles, Users, Tours, StatusBooking, Bookings, PaymentsMethods, PaymentStatus, Payments, Destinations, TourDestinations, PasswordChangeRequest
 from pydantic import BaseModel, EmailStr
 from email_utils import send_email, generation_confirmation_code
+from token_cache import TokenCache, CachedToken
+from passwords import PasswordHasher, PasswordHasherBusy
+from token_expiry import ExpiryWriter
+from signed_tokens import TokenSigner, RevocationList, parse_signing_keys
+from sessions import SessionStore, MemorySessionBackend, DatabaseSessionBackend, hash_token
+from peewee import SqliteDatabase, JOIN
 from datetime import datetime, timedelta, date
 import uuid
 from typing import Optional
 from pydantic import Field
 import aiofiles
+from contextlib import asynccontextmanager
 
 
-
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Запуск и остановка фоновых задач приложения.
+    Схема БД и начальные данные готовятся заранее командой python manage.py init"""
+    to_thread.current_default_thread_limiter().total_tokens = DB_THREAD_POOL_SIZE
+    await async_db.connect()
+    try:
+        await run_in_threadpool(reference_data.load)
+    except Exception as e:
+        print(f'Справочники не загружены, будут прочитаны при первом обращении: {e}')
+    session_store.start()
+    expiry_writer.start()
+    if token_signer is not None:
+        await run_in_threadpool(revocation_list.start)
+    yield
+    if token_signer is not None:
+        revocation_list.stop()
+    expiry_writer.stop()
+    session_store.stop()
+    await async_db.close()
+    db_connection.close_all()
+
+app = FastAPI(lifespan=lifespan)
+
+"""Учет запросов к БД по маршрутам (метрики /service/metrics/). QUERY_DEBUG=1 - заголовки
+X-DB-Queries/X-DB-Time/X-DB-Repeated и предупреждения о N+1 в журнале, QUERY_BUDGET_STRICT=1 -
+превышение бюджета обработчика (query_budget) завершает запрос ошибкой, для тестов"""
+QUERY_DEBUG = os.getenv('QUERY_DEBUG', '0') == '1'
+QUERY_BUDGET_STRICT = os.getenv('QUERY_BUDGET_STRICT', '0') == '1'
+query_metrics = QueryMetrics(repeat_threshold=int(os.getenv('QUERY_REPEAT_THRESHOLD', 10)))
+
+app.add_middleware(ConnectionPerRequestMiddleware, database=db_connection)
+app.add_middleware(QueryRecorderMiddleware, metrics=query_metrics, debug=QUERY_DEBUG, strict=QUERY_BUDGET_STRICT)
+
+"""Условные GET-запросы: ETag по телу ответа, 304 при совпадении с If-None-Match"""
+app.add_middleware(ConditionalGetMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -26,6 +81,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=['*'],
     allow_headers=['*'],
+    expose_headers=[NEXT_CURSOR_HEADER, 'ETag'],
 )
 
 """Настройка директории для хранения изображений"""
@@ -34,33 +90,188 @@ IMAGE_DIR = os.path.join(BASE_DIR, 'data', 'images')
 os.makedirs(IMAGE_DIR, exist_ok=True)
 app.mount('/images', StaticFiles(directory=IMAGE_DIR), name='images')
 
-def hash_password(password: str) -> str:
+"""Модель выполнения: все обработчики, работающие с БД, объявлены через def и выполняются
+в пуле из DB_THREAD_POOL_SIZE потоков. Асинхронными остаются только обработчики, которым
+нужно ждать (хеширование пароля, загрузка файла) - свои запросы к БД они передают в тот же
+пул через run_in_threadpool, поэтому цикл событий никогда не блокируется запросами к MySQL"""
+DB_THREAD_POOL_SIZE = int(os.getenv('DB_THREAD_POOL_SIZE', DB_MAX_CONNECTIONS))
+
+"""Самые нагруженные пути (проверка токена, список туров, поиск направлений, создание
+бронирования и платежа) работают с БД через асинхронный драйвер ASYNC_DB_DRIVER и не занимают
+потоки на время ожидания: aiomysql - асинхронный пул к MySQL, aiosqlite - файл
+ASYNC_DB_SQLITE_PATH (тесты, локальная разработка), threadpool - peewee в пуле потоков"""
+ASYNC_DB_DRIVER = os.getenv('ASYNC_DB_DRIVER', 'threadpool')
+
+def create_async_driver(name: str):
+    """Создает асинхронный драйвер БД по названию"""
+    if name == 'aiomysql':
+        return AioMySQLDriver(DB_NAME, host=DB_HOST, port=DB_PORT, user=DB_USERNAME, password=DB_PASSWORD,
+                              maxsize=DB_MAX_CONNECTIONS, pool_recycle=DB_STALE_TIMEOUT)
+    if name == 'aiosqlite':
+        return AioSQLiteDriver(os.getenv('ASYNC_DB_SQLITE_PATH', os.path.join(BASE_DIR, 'data', 'tourist_ag.db')))
+    if name == 'threadpool':
+        return ThreadPoolDriver(db_connection)
+    raise RuntimeError(f'Неизвестный драйвер БД: {name}')
+
+async_db = create_async_driver(ASYNC_DB_DRIVER)
+
+"""Справочники (статусы, способы оплаты, роли) хранятся в памяти; изменения из других
+процессов подхватываются через REFERENCE_DATA_TTL секунд"""
+reference_data = ReferenceData(ttl=int(os.getenv('REFERENCE_DATA_TTL', 300)))
+
+"""Готовые ответы списка туров: CATALOG_CACHE_SIZE страниц, изменения из других процессов
+подхватываются через CATALOG_CACHE_TTL секунд"""
+tour_catalog = CatalogCache(maxsize=int(os.getenv('CATALOG_CACHE_SIZE', 256)),
+                            ttl=int(os.getenv('CATALOG_CACHE_TTL', 60)))
+
+"""Одинаковые одновременные запросы списка туров и поиска направлений выполняют один запрос к БД"""
+single_flight = SingleFlight(db_connection)
+
+"""Результаты поиска направлений: SEARCH_CACHE_SIZE последних запросов (country, city),
+изменения из других процессов подхватываются через SEARCH_CACHE_TTL секунд"""
+destination_search = ResultCache(maxsize=int(os.getenv('SEARCH_CACHE_SIZE', 1024)),
+                                 ttl=int(os.getenv('SEARCH_CACHE_TTL', 60)))
+
+"""Хеширование паролей выполняется в пуле из PASSWORD_HASH_WORKERS потоков,
+в очереди ждут не более PASSWORD_HASH_QUEUE запросов"""
+password_hasher = PasswordHasher(
+    max_workers=int(os.getenv('PASSWORD_HASH_WORKERS', 0)) or None,
+    max_queue=int(os.getenv('PASSWORD_HASH_QUEUE', 64))
+)
+
+def release_db_connection() -> None:
+    """Возвращает соединение запроса в пул на время долгой работы без БД (хеширования пароля),
+    чтобы волна входов не занимала весь пул; следующий запрос к БД возьмет соединение заново"""
+    if not db_connection.is_closed() and not db_connection.in_transaction():
+        db_connection.close()
+
+async def hash_password(password: str) -> str:
     """Функция хеширования паролей"""
-    return hashlib.sha512(password.encode('utf-8')).hexdigest()
+    release_db_connection()
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHasherBusy:
+        raise HTTPException(503, 'Сервер перегружен, повторите попытку позже.')
+
+async def verify_password(password: str, stored: str) -> bool:
+    """Функция проверки пароля"""
+    release_db_connection()
+    try:
+        return await password_hasher.verify(password, stored)
+    except PasswordHasherBusy:
+        raise HTTPException(503, 'Сервер перегружен, повторите попытку позже.')
 
 EMAIL_REGEX = r'^[A-Za-zА-Яа-яЁё0-9._%+-]+@[A-Za-zА-Яа-яЁё-]+\.[A-Za-zА-Яа-яЁё-]{2,10}$'
 PHONE_REGEX = r'^[0-9+()\-#]{10,15}$'
 
+"""Кэш токенов: повторные запросы с тем же токеном не обращаются к БД"""
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 60))
+token_cache = TokenCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+
+"""Хранилище сессий: database - таблица Sessions в основной БД,
+sqlite - отдельный файл SESSION_SQLITE_PATH, memory - память процесса (один воркер)"""
+TOKEN_LIFETIME = timedelta(hours=1)
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'database')
+SESSION_SWEEP_INTERVAL = int(os.getenv('SESSION_SWEEP_INTERVAL', 300))
+
+def create_session_backend(name: str):
+    """Создает хранилище сессий по названию"""
+    if name == 'memory':
+        return MemorySessionBackend()
+    if name == 'sqlite':
+        path = os.getenv('SESSION_SQLITE_PATH', os.path.join(BASE_DIR, 'data', 'sessions.db'))
+        return DatabaseSessionBackend(SqliteDatabase(path, pragmas={'journal_mode': 'wal'}))
+    if name == 'database':
+        return DatabaseSessionBackend()
+    raise RuntimeError(f'Неизвестное хранилище сессий: {name}')
+
+session_store = SessionStore(create_session_backend(SESSION_BACKEND), TOKEN_LIFETIME,
+                             sweep_interval=SESSION_SWEEP_INTERVAL)
+
+"""Продление токенов: срок сдвигается не чаще, чем раз в TOKEN_EXPIRY_GRANULARITY секунд,
+и записывается в хранилище сессий пачкой раз в TOKEN_FLUSH_INTERVAL секунд (0 - сразу)"""
+TOKEN_EXPIRY_GRANULARITY = timedelta(seconds=int(os.getenv('TOKEN_EXPIRY_GRANULARITY', 300)))
+TOKEN_FLUSH_INTERVAL = int(os.getenv('TOKEN_FLUSH_INTERVAL', 30))
+expiry_writer = ExpiryWriter(session_store.set_expiry, interval=TOKEN_FLUSH_INTERVAL)
+
+"""Режим токенов: opaque - случайный токен сессии, signed - подписанный токен,
+проверяемый без обращения к БД. Ключи задаются строкой 'kid1:secret1,kid2:secret2',
+новые токены подписываются первым ключом, остальные принимаются для ротации"""
+TOKEN_MODE = os.getenv('TOKEN_MODE', 'opaque')
+SIGNED_TOKEN_LIFETIME = timedelta(seconds=int(os.getenv('SIGNED_TOKEN_LIFETIME', 8 * 3600)))
+SIGNING_KEYS = parse_signing_keys(os.getenv('TOKEN_SIGNING_KEYS', ''))
+if TOKEN_MODE == 'signed' and not SIGNING_KEYS:
+    raise RuntimeError('Для TOKEN_MODE=signed необходимо задать TOKEN_SIGNING_KEYS.')
+token_signer = TokenSigner(SIGNING_KEYS, SIGNED_TOKEN_LIFETIME) if SIGNING_KEYS else None
+revocation_list = RevocationList(max_age=SIGNED_TOKEN_LIFETIME,
+                                 refresh_interval=int(os.getenv('TOKEN_REVOCATION_REFRESH', 10)))
+
+
+def verify_signed_token(token: str) -> CachedToken:
+    """Проверка подписанного токена без обращения к БД"""
+    verified = token_signer.verify(token)
+    if not verified:
+        raise HTTPException(401, 'Неверный или отсутствующий токен.')
+    user, issued_at, jti = verified
+    if revocation_list.is_revoked(user.id, issued_at, jti):
+        raise HTTPException(401, 'Токен отозван. Авторизуйтесь повторно.')
+    return user
+
+def revoke_user_tokens(user_id: int) -> None:
+    """Завершает все сессии пользователя и отзывает его подписанные токены"""
+    session_store.revoke_user(user_id)
+    token_cache.invalidate_user(user_id)
+    if token_signer is not None:
+        revocation_list.revoke_user(user_id)
 
-def get_user_by_token(token: str, required_role: Optional[str] = None) -> Users:
+async def get_user_by_token(token: str, required_role: Optional[str] = None) -> CachedToken:
     """Функция аутентификации пользователя по токену"""
-    user = Users.select().where(Users.token==token).first()
-    if not user:
-        raise HTTPException(401, 'Неверный или отсутствующий токен.')
-    if user.token_expires_at is None or datetime.now() > user.token_expires_at:
+    signed = token_signer is not None and token_signer.is_signed(token)
+    user = verify_signed_token(token) if signed else token_cache.get(token)
+    if user is None:
+        session = await session_store.get_async(token, async_db)
+        if not session:
+            raise HTTPException(401, 'Неверный или отсутствующий токен.')
+        if datetime.now() > session.expires_at:
+            raise HTTPException(401, 'Срок действия токена истек.')
+        user = CachedToken(session.user_id, session.role, session.expires_at)
+        token_cache.set(token, user)
+
+    now = datetime.now()
+    if now > user.expires_at:
+        token_cache.invalidate(token)
         raise HTTPException(401, 'Срок действия токена истек.')
-    if required_role and user.role.name != required_role:
+    if required_role and user.role != required_role:
         raise HTTPException(403, 'Недостаточно прав для выполнения этого действия.')
 
-    user.token_expires_at = datetime.now() + timedelta(hours=1)
-    user.save()
+    new_expires_at = now + TOKEN_LIFETIME
+    if not signed and new_expires_at - user.expires_at > TOKEN_EXPIRY_GRANULARITY:
+        user = user._replace(expires_at=new_expires_at)
+        token_cache.set(token, user)
+        await run_in_threadpool(expiry_writer.touch, hash_token(token), new_expires_at)
     return user
 
+async def current_user(token: str = Header(...)) -> CachedToken:
+    """Зависимость: текущий пользователь по токену из заголовка"""
+    return await get_user_by_token(token)
+
+async def current_user_by_query(token: str) -> CachedToken:
+    """Зависимость: текущий пользователь по токену из параметра запроса"""
+    return await get_user_by_token(token)
+
+def require_role(role: str):
+    """Зависимость: текущий пользователь, обладающий указанной ролью"""
+    async def dependency(token: str = Header(...)) -> CachedToken:
+        return await get_user_by_token(token, role)
+    return dependency
+
 class AuthRequest(BaseModel):
     """Модель запроса аутентификации"""
     email: str | None = None
     number_phone: str | None = None
     password: str
+    device: str | None = None
 
 class SetRoleRequest(BaseModel):
     """Модель запроса смены роли пользователя"""
@@ -189,20 +400,23 @@ async def create_user(email: str, password: str, full_name: str, number_phone: s
     if not re.fullmatch(EMAIL_REGEX, email) or not re.fullmatch(PHONE_REGEX, number_phone):
         raise HTTPException(400, 'Неверный формат данных email/номера телефона.')
     try:
-        existing_user = Users.select().where((Users.email==email) | (Users.number_phone==number_phone)).first()
+        existing_user = await run_in_threadpool(
+            Users.select().where((Users.email==email) | (Users.number_phone==number_phone)).first)
         if existing_user:
             raise HTTPException(403, 'Пользователь с таким email/номером телефона уже существует.')
             
-        hashed_password = hash_password(password=password)
-        with db_connection.atomic():
-            user_role = Roles.get(Roles.id == 1)
-            Users.create(
-                email=email,
-                password=hashed_password,
-                full_name=full_name,
-                number_phone=number_phone,
-                role=user_role
-            )
+        hashed_password = await hash_password(password=password)
+        user_role = await reference_data.roles.id_of_async('Пользователь', async_db)
+        if user_role is None:
+            raise HTTPException(500, 'Роль пользователя не найдена.')
+        await run_in_threadpool(
+            Users.create,
+            email=email,
+            password=hashed_password,
+            full_name=full_name,
+            number_phone=number_phone,
+            role=user_role
+        )
         return {'message': 'Вы успешно зарегистрировались!'}
     
     except HTTPException as http_exc:
@@ -212,7 +426,7 @@ async def create_user(email: str, password: str, full_name: str, number_phone: s
         raise HTTPException(500, f'Произошла ошибка при регистрации: {e}')
             
 @app.post('/users/auth/', tags=['Users'])
-async def auth_user(data: AuthRequest):
+async def auth_user(data: AuthRequest, user_agent: Optional[str] = Header(None)):
     """Аутентификация пользователя"""
     email = data.email
     number_phone = data.number_phone
@@ -229,21 +443,25 @@ async def auth_user(data: AuthRequest):
     try:
         query = None
         if email:
-            query = Users.select().where(Users.email==email)
+            query = Users.select(Users, Roles).join(Roles).where(Users.email==email)
         elif number_phone:
-            query = Users.select().where(Users.number_phone==number_phone)
-        existing_user = query.first() if query else None
+            query = Users.select(Users, Roles).join(Roles).where(Users.number_phone==number_phone)
+        existing_user = await run_in_threadpool(query.first) if query else None
         if not existing_user:
             raise HTTPException(404, 'Пользователь с таким email/номера телефона не существует.')
-        enter_hash_password = hash_password(password)
-        if enter_hash_password != existing_user.password:
+        if not await verify_password(password, existing_user.password):
             raise HTTPException(401, 'Вы ввели неверный пароль! Попробуйте еще раз.')
+        if password_hasher.needs_rehash(existing_user.password):
+            new_hash = await hash_password(password)
+            await run_in_threadpool(Users.update({
+                    Users.password: new_hash
+                }).where(Users.id == existing_user.id).execute)
         
-        token = str(uuid.uuid4())
-        expires_at = datetime.now() + timedelta(hours=1)
-        existing_user.token = token
-        existing_user.token_expires_at = expires_at
-        existing_user.save()
+        if TOKEN_MODE == 'signed':
+            token, expires_at = token_signer.issue(existing_user.id, existing_user.role.name)
+        else:
+            token, expires_at = await run_in_threadpool(session_store.create, existing_user.id,
+                                                        existing_user.role.name, data.device or user_agent)
         
         return {'message': 'Вы успешно авторизовались.',
                 'token': token,
@@ -256,7 +474,7 @@ async def auth_user(data: AuthRequest):
         raise HTTPException(500, f'Произошла ошибка при авторизации: {e}')
 
 @app.post('/users/change_password/', tags=['Users'])
-async def request_password_change(email: str):
+def request_password_change(email: str):
     """Запрос на смену пароля"""
     user = Users.select().where(Users.email==email).first()
     if not user:
@@ -278,11 +496,11 @@ async def request_password_change(email: str):
 @app.post('/users/confirm_change_password/', tags=['Users'])
 async def confirm_password_change(email: str, code: str, new_password: str):
     """Подтверждение смены пароля"""
-    user = Users.select().where(Users.email==email).first()
+    user = await run_in_threadpool(Users.select().where(Users.email==email).first)
     if not user:
         raise HTTPException(404, 'Пользователь с таким email не найден.')
-    request = PasswordChangeRequest.select().where((PasswordChangeRequest.user==user)
-                                                   & (PasswordChangeRequest.code==code)).order_by(PasswordChangeRequest.created_at.desc()).first()
+    request = await run_in_threadpool(PasswordChangeRequest.select().where((PasswordChangeRequest.user==user)
+                                                   & (PasswordChangeRequest.code==code)).order_by(PasswordChangeRequest.created_at.desc()).first)
 
     if not request:
         raise HTTPException(404, 'Неверный код подтверждения.')
@@ -290,45 +508,61 @@ async def confirm_password_change(email: str, code: str, new_password: str):
     if datetime.now() > request.expires_at:
         raise HTTPException(400, 'Срок действия кода истек. Попробуйте снова.')
     
-    updated_rows = Users.update({
-            Users.password: hash_password(new_password)
-        }).where(Users.id == request.user.id).execute()
+    new_hash = await hash_password(new_password)
+    updated_rows = await run_in_threadpool(Users.update({
+            Users.password: new_hash
+        }).where(Users.id == user.id).execute)
     
     if updated_rows == 0:
         raise HTTPException(500, 'Не удалось обновить пароль.')
     
-    request.delete_instance()
+    await run_in_threadpool(revoke_user_tokens, user.id)
+    await run_in_threadpool(request.delete_instance)
     
     return {'message': 'Пароль успешно обновлен.'}
 
 @app.delete('/users/delete_profile/', tags=['Users'])
-async def delete_profile(token: str = Header(...)):
+def delete_profile(user: CachedToken = Depends(current_user)):
     """Удаление профиля пользователя"""
-    user = get_user_by_token(token)
-    if not user:
-        raise HTTPException(401, 'Пользователь не найден.')
-    user.delete_instance()
+    Users.delete_by_id(user.id)
+    revoke_user_tokens(user.id)
     return {'message': 'Аккаунт успешно удален.'}
 
+@app.post('/users/logout/', tags=['Users'])
+def logout_user(token: str = Header(...), user: CachedToken = Depends(current_user)):
+    """Выход пользователя из системы на текущем устройстве"""
+    if token_signer is not None and token_signer.is_signed(token):
+        _, _, jti = token_signer.verify(token)
+        revocation_list.revoke_token(jti, user.expires_at)
+    else:
+        session_store.revoke(token)
+    token_cache.invalidate(token)
+    return {'message': 'Вы успешно вышли из системы.'}
+
+@app.post('/users/logout_all/', tags=['Users'])
+def logout_all_devices(user: CachedToken = Depends(current_user)):
+    """Выход пользователя из системы на всех устройствах"""
+    revoke_user_tokens(user.id)
+    return {'message': 'Вы вышли из системы на всех устройствах.'}
+
 @app.get('/users/me/', tags=['Users'])
-async def get_profile(token: str):
+def get_profile(user: CachedToken = Depends(current_user_by_query)):
     """Получение информации о текущем пользователе"""
-    user = get_user_by_token(token)
-    if not user:
+    profile = Users.get_or_none(Users.id == user.id)
+    if not profile:
         raise HTTPException(401, 'Пользователь не найден.')
     return {
-        'id': user.id,
-        'email': user.email,
-        'full_name': user.full_name,
-        'number_phone': user.number_phone,
-        'role': user.role.name
+        'id': profile.id,
+        'email': profile.email,
+        'full_name': profile.full_name,
+        'number_phone': profile.number_phone,
+        'role': user.role
     }
 
 
 @app.post('/users/set_role/', tags=['Users'])
-async def set_user_role(data: SetRoleRequest, token: str = Header(...)):
+def set_user_role(data: SetRoleRequest, admin: CachedToken = Depends(require_role('Администратор'))):
     """Изменение роли пользователя (только для администратора)"""
-    current_user = get_user_by_token(token, 'Администратор')
     try:
         if not data.email and not data.number_phone:
             raise HTTPException(400, 'Укажите email или номер телефона.')
@@ -341,12 +575,16 @@ async def set_user_role(data: SetRoleRequest, token: str = Header(...)):
         if not user:
             raise HTTPException(404, 'Пользователь не найден')
         
-        new_role = Roles.get_or_none(Roles.name == data.new_role)
-        if not new_role:
+        new_role = reference_data.roles.id_of(data.new_role)
+        if new_role is None:
             raise HTTPException(400, 'Недопустимая роль. Допустимые значения: Пользователь, Администратор')
         
         user.role = new_role
         user.save()
+        session_store.set_role(user.id, data.new_role)
+        token_cache.invalidate_user(user.id)
+        if token_signer is not None:
+            revocation_list.revoke_user(user.id)
         
         return {
             'message': 'Роль пользователя успешно изменена',
@@ -360,44 +598,70 @@ async def set_user_role(data: SetRoleRequest, token: str = Header(...)):
     except Exception as e:
         raise HTTPException(500, f'Ошибка при изменении роли: {e}')
     
+"""Список пользователей выдается потоком, поэтому страница может быть намного больше обычной"""
+USERS_MAX_PAGE_SIZE = int(os.getenv('USERS_PAGE_SIZE_MAX', 100000))
+
+USER_FIELDS = Projection({
+    'id': FieldSpec('id', Users.id),
+    'email': FieldSpec('email', Users.email),
+    'full_name': FieldSpec('full_name', Users.full_name),
+    'number_phone': FieldSpec('number_phone', Users.number_phone),
+    'role': FieldSpec('role', Roles.name),
+}, key=[Users.id])
+
 @app.get('/users/get_all/', tags=['Users'])
-async def get_all_users(token: str = Header(...)):
-    """Получение списка всех пользователей (только для администратора)"""
-    user = get_user_by_token(token, 'Администратор')
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-    
-    users = Users.select()
-    return [{
-        'id': u.id,
-        'email': u.email,
-        'full_name': u.full_name,
-        'number_phone': u.number_phone,
-        'role': u.role.name
-    } for u in users]
+def get_all_users(role: Optional[str] = None, email_prefix: Optional[str] = None,
+                  limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=USERS_MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                  fields: Optional[str] = Depends(fields_param),
+                  user: CachedToken = Depends(require_role('Администратор'))):
+    """Получение списка пользователей постранично (только для администратора).
+    Фильтры: роль и начало email"""
+    page = make_page(limit, cursor)
+    names = USER_FIELDS.parse(fields)
+    query = Users.select(*USER_FIELDS.columns(names)).join(Roles).tuples()
+    if role:
+        query = query.where(Roles.name == role)
+    if email_prefix:
+        query = query.where(Users.email.startswith(email_prefix))
+    key = [Users.id]
+    next_cursor = next_page_cursor(query, key, page)
+    users = (USER_FIELDS.to_dict(names, row) for row in iterate_page(query, key, page))
+    return StreamingResponse(json_array_stream(users), media_type='application/json',
+                             headers={NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None)
 
 @app.delete('/users/delete_admin_user/', tags=['Users'])
-async def admin_delete_user(user_id: int, token: str = Header(...)):
+def admin_delete_user(user_id: int, admin: CachedToken = Depends(require_role('Администратор'))):
     """Удаление пользователя администратором"""
-    admin = get_user_by_token(token, 'Администратор')
-    if not admin:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-    
     try:
-        user = Users.get(Users.id == user_id)
+        user = Users.select(Users, Roles).join(Roles).where(Users.id == user_id).get()
         if user.role.name == 'Администратор':
-            admins_count = Users.select().where(Users.role.name == 'Администратор').count()
+            admins_count = Users.select().join(Roles).where(Roles.name == 'Администратор').count()
             if admins_count == 1:
                 raise HTTPException(400, 'Нельзя удалить последнего администратора.')
 
         user.delete_instance()
+        revoke_user_tokens(user.id)
         return {'message': 'Пользователь успешно удален.'}
         
+    except HTTPException as http_exc:
+        raise http_exc
     except Users.DoesNotExist:
         raise HTTPException(404, 'Пользователь не найден.')
     except Exception as e:
         raise HTTPException(500, f'Ошибка при удалении пользователя: {e}')
 
+@app.get('/service/metrics/', tags=['Service'])
+async def get_service_metrics(user: CachedToken = Depends(require_role('Администратор'))):
+    """Метрики внутренних подсистем API (только для администратора)"""
+    return {
+        'password_hashing': password_hasher.stats(),
+        'database_pool': db_connection.stats(),
+        'queries': query_metrics.stats(),
+        'tour_catalog': tour_catalog.stats(),
+        'single_flight': single_flight.stats(),
+        'destination_search': destination_search.stats()
+    }
+
 @app.post('/tours/create/', tags=['Tours'])
 async def create_tour(
     name: str = Form(...),
@@ -405,14 +669,10 @@ async def create_tour(
     price: int = Form(...),
     days: int = Form(...),
     country: str = Form(...),
-    token: str = Header(...),
+    user: CachedToken = Depends(require_role('Администратор')),
     image: UploadFile = File(...)
 ):
     """Создание нового тура (только для администратора)"""
-    user = get_user_by_token(token, 'Администратор')
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-    
     try:
         allowed_extensions = ['.jpg', '.jpeg', '.png']
         file_ext = os.path.splitext(image.filename)[1].lower()
@@ -426,7 +686,8 @@ async def create_tour(
             content = await image.read()
             await buffer.write(content)
             
-        Tours.create(
+        await run_in_threadpool(
+            Tours.create,
             name=name,
             description=description,
             price=price,
@@ -434,6 +695,7 @@ async def create_tour(
             country=country,
             image_filename=filename
         )
+        tour_catalog.invalidate()
         return {'message': 'Тур успешно создан.'}
     
     except HTTPException as http_exc:
@@ -442,42 +704,63 @@ async def create_tour(
     except Exception as e:
         raise HTTPException(500, f'Ошибка при создании тура: {e}')
 
-@app.get('/tours/get_tours/', tags=['Tours'])
-async def get_all_tours(token: str = Header(...)):
-    """Получение списка всех туров"""
-    user = get_user_by_token(token)
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-        
-    tours = Tours.select()
-    return [{
-        'id': t.id,
-        'name': t.name,
-        'description': t.description,
-        'price': t.price,
-        'days': t.days,
-        'country': t.country,
-        'image_url': f'/images/{t.image_filename}' if t.image_filename else None
-    } for t in tours]
+def image_url(image_filename: str) -> Optional[str]:
+    """Ссылка на изображение тура"""
+    return f'/images/{image_filename}' if image_filename else None
+
+TOUR_FIELDS = Projection({
+    'id': FieldSpec('id', Tours.id),
+    'name': FieldSpec('name', Tours.name),
+    'description': FieldSpec('description', Tours.description),
+    'price': FieldSpec('price', Tours.price),
+    'days': FieldSpec('days', Tours.days),
+    'country': FieldSpec('country', Tours.country),
+    'image_url': FieldSpec('image_url', Tours.image_filename, image_url),
+}, key=[Tours.id])
+
+TOUR_DETAIL_FIELDS = Projection({
+    'name': FieldSpec('Название тура:', Tours.name),
+    'description': FieldSpec('Описание:', Tours.description),
+    'price': FieldSpec('Цена', Tours.price),
+    'days': FieldSpec('Длительность', Tours.days),
+    'country': FieldSpec('Страна', Tours.country),
+})
+
+async def build_tours_page(key: tuple, version: int):
+    """Страница каталога туров из БД, сохраняемая в кэш каталога"""
+    page, names = key
+    tours = await async_db.fetch_all(page_query(Tours.select(*TOUR_FIELDS.columns(names)), TOUR_FIELDS.key, page))
+    tours, cursor = split_page(tours, TOUR_FIELDS.key, page)
+    return tour_catalog.set(key, version, dumps([TOUR_FIELDS.to_dict(names, row) for row in tours]),
+                            {NEXT_CURSOR_HEADER: cursor} if cursor else {})
+
+@app.get('/tours/get_tours/', tags=['Tours'], response_class=FastJSONResponse)
+@query_budget(3)
+async def get_all_tours(page: Page = Depends(page_params), fields: Optional[str] = Depends(fields_param),
+                        if_none_match: Optional[str] = Header(None), user: CachedToken = Depends(current_user)):
+    """Получение списка туров (постранично); ответы кэшируются до изменения каталога"""
+    names = TOUR_FIELDS.parse(fields)
+    key = (page, tuple(names))
+    cached = tour_catalog.get(key)
+    if cached is None:
+        version = tour_catalog.version
+        cached = await single_flight.run('tours', (key, version), lambda: build_tours_page(key, version))
+    headers = {'ETag': cached.etag, 'Cache-Control': 'no-cache', **cached.headers}
+    if etag_matches(if_none_match, cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(cached.body, media_type='application/json', headers=headers)
     
 @app.get('/tours/get_tour_id/', tags=['Tours'])
-async def get_tour_by_id(tour_id: int, token: str = Header(...)):
+def get_tour_by_id(tour_id: int, fields: Optional[str] = Depends(fields_param),
+                   user: CachedToken = Depends(require_role('Администратор')),
+                   conditional: None = Depends(conditional_get)):
     """Получение тура по ID (только для администратора)"""
-    user = get_user_by_token(token, 'Администратор')
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-        
-    tour = Tours.select().where(Tours.id==tour_id).first()
+    names = TOUR_DETAIL_FIELDS.parse(fields)
+    tour = Tours.select(*TOUR_DETAIL_FIELDS.columns(names)).where(Tours.id==tour_id).tuples().first()
     if not tour:
         raise HTTPException(404, 'Указанный тур не найден.')
     try:
-        return {
-            'Название тура:': tour.name,
-            'Описание:': tour.description,
-            'Цена': tour.price,
-            'Длительность': tour.days,
-            'Страна': tour.country
-        }
+        return TOUR_DETAIL_FIELDS.to_dict(names, tour)
         
     except HTTPException as http_exc:
         raise http_exc
@@ -486,12 +769,8 @@ async def get_tour_by_id(tour_id: int, token: str = Header(...)):
         raise HTTPException(500, f'Ошибка при получении тура: {e}')
 
 @app.patch('/tours/update/', tags=['Tours'])
-async def update_tour(tour_id: int, data: TourSchemaUpdate, token: str = Header(...)):
+def update_tour(tour_id: int, data: TourSchemaUpdate, user: CachedToken = Depends(require_role('Администратор'))):
     """Обновление информации о туре (только для администратора)"""
-    user = get_user_by_token(token, 'Администратор')
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-        
     tour = Tours.select().where(Tours.id==tour_id).first()
     if not tour:
         raise HTTPException(404, 'Указанный тур не найден.')
@@ -508,6 +787,7 @@ async def update_tour(tour_id: int, data: TourSchemaUpdate, token: str = Header(
             tour.country = data.country
         
         tour.save()
+        tour_catalog.invalidate()
         return {'message': 'Информация о туре успешно изменена.'}
     
     except HTTPException as http_exc:
@@ -517,18 +797,15 @@ async def update_tour(tour_id: int, data: TourSchemaUpdate, token: str = Header(
         raise HTTPException(500, f'Ошибка при обновлении данных о туре: {e}.')
         
 @app.delete('/tours/delete_tour/', tags=['Tours'])
-async def delete_tour_by_id(tour_id: int, token: str = Header(...)):
+def delete_tour_by_id(tour_id: int, user: CachedToken = Depends(require_role('Администратор'))):
     """Удаление тура по ID (только для администратора)"""
-    user = get_user_by_token(token, 'Администратор')
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-        
     tour = Tours.select().where(Tours.id==tour_id).first()
     if not tour:
         raise HTTPException(404, 'Указанный тур не найден.')
     
     try:
         tour.delete_instance()
+        tour_catalog.invalidate()
         return {'message': 'Тур успешно удален.'}
     
     except HTTPException as http_exc:
@@ -539,15 +816,12 @@ async def delete_tour_by_id(tour_id: int, token: str = Header(...)):
 
 """Эндпоинты для работы со статусами бронирования"""
 @app.post('/statusbooking/add_status', tags=['StatusBooking'])
-async def add_status_booking(data: StatusBookingSchema, token: str = Header(...)):
+def add_status_booking(data: StatusBookingSchema, user: CachedToken = Depends(require_role('Администратор'))):
     """Добавление нового статуса бронирования (только для администратора)"""
-    user = get_user_by_token(token, 'Администратор')
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-        
     status = data.status_name
     try:
         StatusBooking.create(status_name=status)
+        reference_data.booking_statuses.invalidate()
         return {'message': 'Статус успешно создан.'}
     
     except HTTPException as http_exc:
@@ -556,34 +830,31 @@ async def add_status_booking(data: StatusBookingSchema, token: str = Header(...)
     except Exception as e:
         raise HTTPException(500, f'Ошибка при создании статуса: {e}')
     
-@app.get('/statusbooking/get_all/', tags=['StatusBooking'])
-async def get_all_status_booking(token: str = Header(...)):
-    """Получение всех статусов бронирования (только для администратора)"""
-    user = get_user_by_token(token, 'Администратор')
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-        
-    status = list(StatusBooking.select())
-    if not status:
+@app.get('/statusbooking/get_all/', tags=['StatusBooking'], response_class=FastJSONResponse)
+def get_all_status_booking(response: Response, page: Page = Depends(page_params),
+                           user: CachedToken = Depends(require_role('Администратор')),
+                           conditional: None = Depends(conditional_get)):
+    """Получение статусов бронирования постранично (только для администратора)"""
+    status, cursor = paginate(StatusBooking.select(StatusBooking.id, StatusBooking.status_name).tuples(),
+                              [StatusBooking.id], page)
+    if not status and page.after is None:
         raise HTTPException(404, 'Статусы бронирования не найдены')
-    return [{
-        'id': s.id,
-        'Статус': s.status_name
-    } for s in status]
+    set_next_cursor(response, cursor)
+    return fast_json([{
+        'id': status_id,
+        'Статус': status_name
+    } for status_id, status_name in status], response)
 
 @app.put('/statusbooking/edit_status/', tags=['StatusBooking'])
-async def edit_status_booking(status_id: int, data: StatusBookingSchema, token: str = Header(...)):
+def edit_status_booking(status_id: int, data: StatusBookingSchema, user: CachedToken = Depends(require_role('Администратор'))):
     """Редактирование статуса бронирования (только для администратора)"""
-    user = get_user_by_token(token, 'Администратор')
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-        
     status = StatusBooking.select().where(StatusBooking.id==status_id).first()
     if not status:
         raise HTTPException(404, f'Указанного статуса не существует.')
     try:
         status.status_name = data.status_name
         status.save()
+        reference_data.booking_statuses.invalidate()
         return {'message': 'Статус успешно изменен.'}
     
     except HTTPException as http_exc:
@@ -593,12 +864,9 @@ async def edit_status_booking(status_id: int, data: StatusBookingSchema, token:
         raise HTTPException(500, f'Ошибка при внесении изменений: {e}')
 
 @app.get('/statusbooking/get_status_by_id/', tags=['StatusBooking'])
-async def get_status_by_id(status_id: int, token: str = Header(...)):
+def get_status_by_id(status_id: int, user: CachedToken = Depends(require_role('Администратор')),
+                     conditional: None = Depends(conditional_get)):
     """Получение статуса бронирования по ID (только для администратора)"""
-    user = get_user_by_token(token, 'Администратор')
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-        
     status = StatusBooking.select().where(StatusBooking.id==status_id).first()
     if not status:
         raise HTTPException(404, f'Указанного статуса не существует.')
@@ -607,12 +875,8 @@ async def get_status_by_id(status_id: int, token: str = Header(...)):
     }
     
 @app.delete('/statusbooking/delete_status/', tags=['StatusBooking'])
-async def delete_booking_status(status_id: int, token: str = Header(...)):
+def delete_booking_status(status_id: int, user: CachedToken = Depends(require_role('Администратор'))):
     """Удаление статуса бронирования (только для администратора)"""
-    user = get_user_by_token(token, 'Администратор')
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-        
     try:
         status = StatusBooking.get_or_none(StatusBooking.id == status_id)
         if not status:
@@ -623,6 +887,7 @@ async def delete_booking_status(status_id: int, token: str = Header(...)):
             raise HTTPException(400, 'Невозможно удалить статус, так как он используется в бронированиях.')
         
         status.delete_instance()
+        reference_data.booking_statuses.invalidate()
         return {'message': 'Статус успешно удален.'}
     except HTTPException as http_exc:
         raise http_exc
@@ -630,37 +895,37 @@ async def delete_booking_status(status_id: int, token: str = Header(...)):
         raise HTTPException(500, f'Ошибка при удалении статуса: {e}')
 
 @app.post('/booking/create_booking/', tags=['Bookings'])
-def create_booking(data: BookingSchemaCreate, token: str = Header(...)):
+async def create_booking(data: BookingSchemaCreate, user: CachedToken = Depends(current_user)):
     """Создание нового бронирования"""
     try:
-        user = get_user_by_token(token)
-        if not user:
-            raise HTTPException(401, 'Недействительный токен.')
-        
         age = datetime.now().date() - data.birthday
         if age < timedelta(days = 365 * 18):
             raise HTTPException(403, 'Пользователю должно быть больше 18 лет.')
         
-        tour = Tours.get_or_none(Tours.name==data.tour_name)
+        tour = await async_db.fetch_one(Tours.select(Tours.id).where(Tours.name==data.tour_name))
         if not tour:
             raise HTTPException(404, 'Тур не найден.')
         
-        status_booking = StatusBooking.get_or_none(StatusBooking.status_name=='Ожидает оплаты')
-        if not status_booking:
+        status_booking = await reference_data.booking_statuses.id_of_async('Ожидает оплаты', async_db)
+        if status_booking is None:
             raise HTTPException(404, 'Статус не найден.')
         
+        email = await async_db.fetch_one(Users.select(Users.email).where(Users.id == user.id))
+        if not email:
+            raise HTTPException(404, 'Пользователь не найден.')
+
         booking_number = uuid.uuid4().hex[:8].upper()
         
-        booking = Bookings.create(
+        await async_db.execute(Bookings.insert(
             user_id=user.id,
-            email=user.email,
+            email=email[0],
             birthday=data.birthday,
-            tour_id=tour.id,
+            tour_id=tour[0],
             booking_date=datetime.now(),
-            status=status_booking.id,
+            status=status_booking,
             number_of_people=data.number_of_people,
             booking_number=booking_number
-        )
+        ))
         return {'message': 'Бронирование тура прошло успешно.',
                 'Номер заявки': booking_number
                 }
@@ -672,18 +937,14 @@ def create_booking(data: BookingSchemaCreate, token: str = Header(...)):
         raise HTTPException(500, f'Произошла ошибка: {e}')
     
 @app.put('/booking/update_booking/', tags=['Bookings'])
-async def update_booking(booking_number: str, data: BookingSchemaUpdate, token: str = Header(...)):
+def update_booking(booking_number: str, data: BookingSchemaUpdate, user: CachedToken = Depends(current_user)):
     """Обновление информации о бронировании"""
     try:
-        user = get_user_by_token(token)
-        if not user:
-            raise HTTPException(401, 'Недействительный токен.')
-        
         booking = Bookings.select().where(Bookings.booking_number==booking_number).first()
         if not booking:
             raise HTTPException(404, 'Бронирование не найдено.')
         
-        if user.role != 'Администратор' and booking.user_id.id != user.id:
+        if user.role != 'Администратор' and booking.user_id_id != user.id:
             raise HTTPException(403, 'Нет прав на изменение этого бронирования.')
 
         if data is not None:
@@ -700,10 +961,10 @@ async def update_booking(booking_number: str, data: BookingSchemaUpdate, token:
                 booking.tour_id = tour.id
 
             if data.status is not None:
-                status_booking = StatusBooking.select().where(StatusBooking.status_name == data.status).first()
-                if not status_booking:
+                status_booking = reference_data.booking_statuses.id_of(data.status)
+                if status_booking is None:
                     raise HTTPException(404, 'Статус не найден.')
-                booking.status = status_booking.id
+                booking.status = status_booking
 
             if data.number_of_people is not None:
                 if data.number_of_people <= 0:
@@ -721,18 +982,14 @@ async def update_booking(booking_number: str, data: BookingSchemaUpdate, token:
         raise HTTPException(500, f'Произошла ошибка: {e}')
     
 @app.delete('/booking/delete_booking/', tags=['Bookings'])
-async def delete_booking(booking_number: str, token: str = Header(...)):
+def delete_booking(booking_number: str, user: CachedToken = Depends(current_user)):
     """Удаление бронирования"""
     try:
-        user = get_user_by_token(token)
-        if not user:
-            raise HTTPException(401, 'Недействительный токен.')
-
         booking = Bookings.select().where(Bookings.booking_number == booking_number).first()
         if not booking:
             raise HTTPException(404, 'Бронирование не найдено.')
 
-        if user.role != 'Администратор' and booking.user_id.id != user.id:
+        if user.role != 'Администратор' and booking.user_id_id != user.id:
             raise HTTPException(403, 'Нет прав на удаление этого бронирования.')
 
         booking.delete_instance()
@@ -744,49 +1001,65 @@ async def delete_booking(booking_number: str, token: str = Header(...)):
     except Exception as e:
         raise HTTPException(500, f'Произошла ошибка при удалении: {e}')
 
-@app.get('/booking/all_bookings/', tags=['Bookings'])
-async def get_all_bookings(token: str = Header(...)):
-    """Получение всех бронирований (только для администратора)"""
+def bookings_query(*columns):
+    """Бронирования вместе с названием тура и статусом одним запросом.
+    LEFT JOIN: тур или статус могут быть удалены (on_delete='SET NULL')"""
+    return (Bookings
+            .select(*(columns or (Bookings.booking_id, Bookings.booking_number, Bookings.email, Bookings.birthday,
+                                  Tours.name, Bookings.booking_date, StatusBooking.status_name,
+                                  Bookings.number_of_people)))
+            .join_from(Bookings, Tours, JOIN.LEFT_OUTER, on=(Bookings.tour_id == Tours.id))
+            .join_from(Bookings, StatusBooking, JOIN.LEFT_OUTER, on=(Bookings.status == StatusBooking.id))
+            .tuples())
+
+BOOKING_FIELDS = Projection({
+    'booking_number': FieldSpec('Номер заявки:', Bookings.booking_number),
+    'email': FieldSpec('e-mail:', Bookings.email),
+    'birthday': FieldSpec('Дата рождения:', Bookings.birthday, date.isoformat),
+    'tour': FieldSpec('Название тура:', Tours.name),
+    'booking_date': FieldSpec('Дата бронирования:', Bookings.booking_date),
+    'status': FieldSpec('Статус:', StatusBooking.status_name),
+    'number_of_people': FieldSpec('Количество человек:', Bookings.number_of_people),
+}, key=[Bookings.booking_id])
+
+USER_BOOKING_FIELDS = Projection({
+    name: BOOKING_FIELDS.fields[name]
+    for name in ['booking_number', 'tour', 'booking_date', 'status', 'number_of_people', 'birthday']
+}, key=[Bookings.booking_id])
+
+@app.get('/booking/all_bookings/', tags=['Bookings'], response_class=FastJSONResponse)
+@query_budget(3)
+def get_all_bookings(response: Response, page: Page = Depends(page_params),
+                     fields: Optional[str] = Depends(fields_param),
+                     user: CachedToken = Depends(require_role('Администратор')),
+                     conditional: None = Depends(conditional_get)):
+    """Получение бронирований постранично (только для администратора)"""
     try:
-        user = get_user_by_token(token, 'Администратор')
-        if not user:
-            raise HTTPException(401, 'Недействительный токен.')
-        
-        bookings = Bookings.select()
-        return [{
-            'Номер заявки:': b.booking_number,
-            'e-mail:': b.email,
-            'Дата рождения:': b.birthday.isoformat(),
-            'Название тура:': b.tour_id.name,
-            'Дата бронирования:': b.booking_date,
-            'Статус:': b.status.status_name,
-            'Количество человек:': b.number_of_people
-            } for b in bookings]
+        names = BOOKING_FIELDS.parse(fields)
+        bookings, cursor = paginate(bookings_query(*BOOKING_FIELDS.columns(names)), BOOKING_FIELDS.key, page)
+        set_next_cursor(response, cursor)
+        return fast_json([BOOKING_FIELDS.to_dict(names, row) for row in bookings], response)
         
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
         raise HTTPException(500, f'Ошибка при получении списка бронирований: {e}')
 
-@app.get('/booking/get_booking_by_user/', tags=['Bookings'])
-def get_booking_by_user(email: str, token: str = Header(...)):
+@app.get('/booking/get_booking_by_user/', tags=['Bookings'], response_class=FastJSONResponse)
+@query_budget(3)
+def get_booking_by_user(email: str, response: Response, fields: Optional[str] = Depends(fields_param),
+                        user: CachedToken = Depends(current_user),
+                        conditional: None = Depends(conditional_get)):
     """Получение бронирований по email пользователя"""
     try:
-        user = get_user_by_token(token)
-        if not user:
-            raise HTTPException(401, 'Недействительный токен.')
-        bookings = Bookings.select().where(Bookings.email==email)
+        names = USER_BOOKING_FIELDS.parse(fields)
+        bookings = list(bookings_query(*USER_BOOKING_FIELDS.columns(names))
+                        .where(Bookings.email==email)
+                        .order_by(Bookings.booking_id))
         if not bookings:
             raise HTTPException(404, 'Для данного пользователя нет заявок на бронирование.')
         
-        return [{
-            'Номер заявки:': b.booking_number,
-            'Название тура:': b.tour_id.name,
-            'Дата бронирования:': b.booking_date,
-            'Статус:': b.status.status_name,
-            'Количество человек:': b.number_of_people,
-            'Дата рождения:': b.birthday.isoformat()
-        } for b in bookings]
+        return fast_json([USER_BOOKING_FIELDS.to_dict(names, row) for row in bookings], response)
     
     except HTTPException as http_exc:
         raise http_exc
@@ -794,48 +1067,66 @@ def get_booking_by_user(email: str, token: str = Header(...)):
     except Exception as e:
         raise HTTPException(500, f'Ошибка при получении списка бронирований: {e}')
 
+def date_range(field, date_from: Optional[date], date_to: Optional[date]) -> list:
+    """Условия для поля даты-времени: с начала date_from по конец date_to включительно"""
+    conditions = []
+    if date_from:
+        conditions.append(field >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        conditions.append(field < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+    return conditions
+
+EXPORT_FORMAT_PATTERN = '^(' + '|'.join(EXPORT_FORMATS) + ')$'
+
+BOOKING_EXPORT_COLUMNS = ['booking_id', 'booking_number', 'email', 'birthday', 'tour', 'booking_date',
+                          'status', 'number_of_people']
+
+@app.get('/booking/export/', tags=['Bookings'])
+def export_bookings(export_format: str = Query('ndjson', alias='format', pattern=EXPORT_FORMAT_PATTERN),
+                    date_from: Optional[date] = None, date_to: Optional[date] = None, status: Optional[str] = None,
+                    user: CachedToken = Depends(require_role('Администратор'))):
+    """Выгрузка бронирований в NDJSON или CSV потоком (только для администратора).
+    Фильтры: дата бронирования с/по и название статуса"""
+    query = bookings_query()
+    for condition in date_range(Bookings.booking_date, date_from, date_to):
+        query = query.where(condition)
+    if status:
+        query = query.where(StatusBooking.status_name == status)
+    rows = iterate_all(query, [Bookings.booking_id])
+    return export_response(export_format, BOOKING_EXPORT_COLUMNS, rows, 'bookings')
+
 @app.post('/payment_methods/create_method/', tags=['Payment Methods'])
-async def create_payment_method(data: PaymentMethodCreateSchema, token: str = Header(...)):
+def create_payment_method(data: PaymentMethodCreateSchema, user: CachedToken = Depends(require_role('Администратор'))):
     """Создание метода оплаты (только для администратора)"""
-    user = get_user_by_token(token, 'Администратор')
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-    
     try:
         existing_method = PaymentsMethods.get_or_none(PaymentsMethods.method_name == data.method_name)
         if existing_method:
             raise HTTPException(400, 'Такой способ оплаты уже существует.')
             
         method = PaymentsMethods.create(method_name=data.method_name)
+        reference_data.payment_methods.invalidate()
         return {'message': 'Способ оплаты успешно создан.'}
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
         raise HTTPException(500, f'Ошибка при создании способа оплаты: {e}')
 
-@app.get('/payment_methods/get_all_methods/', tags=['Payment Methods'])
-async def get_all_payment_methods(token: str = Header(...)):
+@app.get('/payment_methods/get_all_methods/', tags=['Payment Methods'], response_class=FastJSONResponse)
+def get_all_payment_methods(response: Response, user: CachedToken = Depends(require_role('Администратор')),
+                            conditional: None = Depends(conditional_get)):
     """Получение всех методов оплаты (только для администратора)"""
-    user = get_user_by_token(token, 'Администратор')
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-    
     try:
         methods = PaymentsMethods.select()
-        return [{
+        return fast_json([{
             'ID:': method.id,
             'Название метода:': method.method_name
-        } for method in methods]
+        } for method in methods], response)
     except Exception as e:
         raise HTTPException(500, f'Ошибка при получении способов оплаты: {e}')
 
 @app.put('/payment_methods/edit_method/', tags=['Payment Methods'])
-async def update_payment_method(data: PaymentMethodUpdateSchema, token: str = Header(...)):
+def update_payment_method(data: PaymentMethodUpdateSchema, user: CachedToken = Depends(require_role('Администратор'))):
     """Обновление метода оплаты (только для администратора)"""
-    user = get_user_by_token(token, 'Администратор')
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-    
     try:
         method = PaymentsMethods.get_or_none(PaymentsMethods.method_name==data.method_name)
         if not method:
@@ -847,6 +1138,7 @@ async def update_payment_method(data: PaymentMethodUpdateSchema, token: str = He
         
         method.method_name = data.new_name_method
         method.save()
+        reference_data.payment_methods.invalidate()
         
         return {
             'message': 'Способ оплаты успешно обновлен.',
@@ -858,18 +1150,15 @@ async def update_payment_method(data: PaymentMethodUpdateSchema, token: str = He
         raise HTTPException(500, f'Ошибка при обновлении способа оплаты: {e}')
 
 @app.delete('/payment_methods/delete_method/', tags=['Payment Methods'])
-async def delete_payment_method(data: PaymentMethodDeleteSchema, token: str = Header(...)):
+def delete_payment_method(data: PaymentMethodDeleteSchema, user: CachedToken = Depends(require_role('Администратор'))):
     """Удаление метода оплаты (только для администратора)"""
-    user = get_user_by_token(token, 'Администратор')
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-    
     try:
         method = PaymentsMethods.get_or_none(PaymentsMethods.method_name == data.method_name)
         if not method:
             raise HTTPException(404, 'Способ оплаты не найден.')
         
         method.delete_instance()
+        reference_data.payment_methods.invalidate()
         return {'message': 'Способ оплаты успешно удален.'}
     except HTTPException as http_exc:
         raise http_exc
@@ -877,47 +1166,37 @@ async def delete_payment_method(data: PaymentMethodDeleteSchema, token: str = He
         raise HTTPException(500, f'Ошибка при удалении способа оплаты: {e}')
 
 @app.post('/payment_status/create_status/', tags=['Payment Status'])
-async def create_payment_status(data: PaymentStatusCreateSchema, token: str = Header(...)):
+def create_payment_status(data: PaymentStatusCreateSchema, user: CachedToken = Depends(require_role('Администратор'))):
     """Создание статуса оплаты (только для администратора)"""
-    user = get_user_by_token(token, 'Администратор')
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-    
     try:
         existing_status = PaymentStatus.get_or_none(PaymentStatus.status_payment == data.status_payment)
         if existing_status:
             raise HTTPException(400, 'Такой статус оплаты уже существует.')
             
         status = PaymentStatus.create(status_payment=data.status_payment)
+        reference_data.payment_statuses.invalidate()
         return {'message': 'Статус оплаты успешно создан.'}
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
         raise HTTPException(500, f'Ошибка при создании статуса оплаты: {e}')
 
-@app.get('/payment_status/get_all_statuses/', tags=['Payment Status'])
-async def get_all_payment_statuses(token: str = Header(...)):
+@app.get('/payment_status/get_all_statuses/', tags=['Payment Status'], response_class=FastJSONResponse)
+def get_all_payment_statuses(response: Response, user: CachedToken = Depends(require_role('Администратор')),
+                             conditional: None = Depends(conditional_get)):
     """Получение всех статусов оплаты (только для администратора)"""
-    user = get_user_by_token(token, 'Администратор')
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-    
     try:
         statuses = PaymentStatus.select()
-        return [{
+        return fast_json([{
             'ID': status.id,
             'Статус оплаты': status.status_payment
-        } for status in statuses]
+        } for status in statuses], response)
     except Exception as e:
         raise HTTPException(500, f'Ошибка при получении статусов оплаты: {e}')
 
 @app.put('/payment_status/edit_status/', tags=['Payment Status'])
-async def update_payment_status(data: PaymentStatusUpdateSchema, token: str = Header(...)):
+def update_payment_status(data: PaymentStatusUpdateSchema, user: CachedToken = Depends(require_role('Администратор'))):
     """Обновление статуса оплаты (только для администратора)"""
-    user = get_user_by_token(token, 'Администратор')
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-    
     try:
         status = PaymentStatus.get_or_none(PaymentStatus.status_payment == data.old_status_name)
         if not status:
@@ -929,6 +1208,7 @@ async def update_payment_status(data: PaymentStatusUpdateSchema, token: str = He
 
         status.status_payment = data.new_status_name
         status.save()
+        reference_data.payment_statuses.invalidate()
         
         return {'message': 'Статус оплаты успешно обновлен.',}
     except HTTPException as http_exc:
@@ -937,17 +1217,15 @@ async def update_payment_status(data: PaymentStatusUpdateSchema, token: str = He
         raise HTTPException(500, f'Ошибка при обновлении статуса оплаты: {e}')
 
 @app.delete('/payment_status/delete_status/', tags=['Payment Status'])
-async def delete_payment_status(data: PaymentStatusDeleteSchema, token: str = Header(...)):
+def delete_payment_status(data: PaymentStatusDeleteSchema, user: CachedToken = Depends(require_role('Администратор'))):
     """Удаление статуса оплаты (только для администратора)"""
-    user = get_user_by_token(token, 'Администратор')
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
     try:
         status = PaymentStatus.get_or_none(PaymentStatus.status_payment == data.status_name)
         if not status:
             raise HTTPException(404, 'Статус оплаты не найден.')
         
         status.delete_instance()
+        reference_data.payment_statuses.invalidate()
         return {'message': 'Статус оплаты успешно удален.'}
     except HTTPException as http_exc:
         raise http_exc
@@ -955,51 +1233,59 @@ async def delete_payment_status(data: PaymentStatusDeleteSchema, token: str = He
         raise HTTPException(500, f'Ошибка при удалении статуса оплаты: {e}')
 
 @app.post('/payments/add_payment/', tags=['Payments'])
-async def create_payment(data: PaymentsCreate, token: str = Header(...)):
+async def create_payment(data: PaymentsCreate, user: CachedToken = Depends(current_user)):
     """Создание платежа"""
-    user = get_user_by_token(token)
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
+    paid_status_created = False
     try:
-        booking = Bookings.get_or_none(Bookings.booking_number==data.booking_number)
-        if not booking:
-            raise HTTPException(404, 'Бронирования с таким номером не найдено.')
-
-        tour = Tours.get_or_none(Tours.id == booking.tour_id_id)
-        if not tour:
-            raise HTTPException(404, 'Тур не найден.')
-        
-        amount = tour.price * booking.number_of_people
-        
-        method = PaymentsMethods.get_or_none(PaymentsMethods.method_name==data.method_name)
-        if not method:
-            raise HTTPException(404, 'Неверно указан способ оплаты.')
-        
-        status = PaymentStatus.get_or_none(PaymentStatus.status_payment==data.payment_status_name)
-        if not status:
-            raise HTTPException(404, 'Неверно указан статус оплаты.')
-
-        payments = Payments.create(
-            booking_id=booking.booking_id,
-            payment_date=datetime.now(),
-            amount=amount,
-            method=method.id,
-            payment_status=status.id         
-        )
+        async with async_db.transaction():
+            booking = await async_db.fetch_one(
+                Bookings
+                .select(Bookings.booking_id, Bookings.number_of_people, Tours.price)
+                .join(Tours, JOIN.LEFT_OUTER, on=(Bookings.tour_id == Tours.id))
+                .where(Bookings.booking_number==data.booking_number)
+            )
+            if not booking:
+                raise HTTPException(404, 'Бронирования с таким номером не найдено.')
 
-        paid_status = StatusBooking.get_or_none(StatusBooking.status_name=='Оплачено')
-        if not paid_status:
-            try:
-                paid_status = StatusBooking.create(status_name='Оплачено')
-            except Exception as e:
-                raise HTTPException(500, f'Ошибка при создании статуса оплаты: {e}')
-        
-        booking.status_id = paid_status.id
-        booking.save()
+            booking_id, number_of_people, price = booking
+            if price is None:
+                raise HTTPException(404, 'Тур не найден.')
+            
+            amount = price * number_of_people
+            
+            method = await reference_data.payment_methods.id_of_async(data.method_name, async_db)
+            if method is None:
+                raise HTTPException(404, 'Неверно указан способ оплаты.')
+            
+            status = await reference_data.payment_statuses.id_of_async(data.payment_status_name, async_db)
+            if status is None:
+                raise HTTPException(404, 'Неверно указан статус оплаты.')
+
+            payment_id = await async_db.execute(Payments.insert(
+                booking_id=booking_id,
+                payment_date=datetime.now(),
+                amount=amount,
+                method=method,
+                payment_status=status
+            ))
+
+            paid_status_id = await reference_data.booking_statuses.id_of_async('Оплачено', async_db)
+            if paid_status_id is None:
+                try:
+                    paid_status_id = await async_db.execute(StatusBooking.insert(status_name='Оплачено'))
+                except Exception as e:
+                    raise HTTPException(500, f'Ошибка при создании статуса оплаты: {e}')
+                paid_status_created = True
+            
+            await async_db.execute(
+                Bookings.update(status=paid_status_id).where(Bookings.booking_id == booking_id)
+            )
+        if paid_status_created:
+            reference_data.booking_statuses.invalidate()
         
         return {
             'message': 'Платеж успешно добавлен.',
-            'payment_id': payments.id,
+            'payment_id': payment_id,
             'amount': amount
         }
     
@@ -1010,12 +1296,8 @@ async def create_payment(data: PaymentsCreate, token: str = Header(...)):
         raise HTTPException(500, f'Произошла ошибка при создании платежа: {e}')
 
 @app.patch('/payments/edit_payment/', tags=['Payments'])
-async def edit_payment(data: PaymentsUpdate, token: str = Header(...)):
+def edit_payment(data: PaymentsUpdate, user: CachedToken = Depends(current_user)):
     """Редактирование платежа"""
-    user = get_user_by_token(token)
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-    
     try:
         payment = Payments.select().where(Payments.id==data.payment_id).first()
     
@@ -1031,10 +1313,10 @@ async def edit_payment(data: PaymentsUpdate, token: str = Header(...)):
                 raise HTTPException(400, 'Сумма платежа должна быть положительной.')
             payment.amount = data.amount
         if data.payment_status_name is not None:
-            status = PaymentStatus.get_or_none(PaymentStatus.status_payment == data.payment_status_name)
-            if not status:
+            status = reference_data.payment_statuses.id_of(data.payment_status_name)
+            if status is None:
                 raise HTTPException(404, 'Указанный статус платежа не найден.')
-            payment.payment_status = status.id
+            payment.payment_status = status
             
         payment.save()
         
@@ -1046,30 +1328,37 @@ async def edit_payment(data: PaymentsUpdate, token: str = Header(...)):
     except Exception as e:
         raise HTTPException(500, f'Произошла ошибка при обновлении платежа: {e}')
 
+def payments_query(*columns):
+    """Платежи вместе с номером бронирования, способом и статусом оплаты одним запросом"""
+    return (Payments
+            .select(*(columns or (Payments.id, Bookings.booking_number, Payments.amount, Payments.payment_date,
+                                  PaymentsMethods.method_name, PaymentStatus.status_payment)))
+            .join_from(Payments, Bookings, JOIN.LEFT_OUTER, on=(Payments.booking_id == Bookings.booking_id))
+            .join_from(Payments, PaymentsMethods, JOIN.LEFT_OUTER, on=(Payments.method == PaymentsMethods.id))
+            .join_from(Payments, PaymentStatus, JOIN.LEFT_OUTER, on=(Payments.payment_status == PaymentStatus.id))
+            .tuples())
+
+PAYMENT_FIELDS = Projection({
+    'id': FieldSpec('id', Payments.id),
+    'booking_number': FieldSpec('Номер бронирования', Bookings.booking_number),
+    'amount': FieldSpec('Сумма', Payments.amount),
+    'payment_date': FieldSpec('Дата', Payments.payment_date),
+    'method': FieldSpec('Метод оплаты', PaymentsMethods.method_name),
+    'status': FieldSpec('Статус оплаты', PaymentStatus.status_payment),
+}, key=[Payments.id])
+
 @app.get('/payments/get_payment_by_id/', tags=['Payments'])
-async def get_payment_by_id(payment_id: int, token: str = Header(...)):
+@query_budget(3)
+def get_payment_by_id(payment_id: int, fields: Optional[str] = Depends(fields_param),
+                      user: CachedToken = Depends(current_user),
+                      conditional: None = Depends(conditional_get)):
     """Получение платежа по ID"""
-    user = get_user_by_token(token)
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-    
     try:
-        payment = Payments.get_or_none(Payments.id == payment_id)
+        names = PAYMENT_FIELDS.parse(fields)
+        payment = payments_query(*PAYMENT_FIELDS.columns(names)).where(Payments.id == payment_id).first()
         if not payment:
             raise HTTPException(404, 'Платеж с указанным ID не найден.')
-
-        booking = Bookings.get_or_none(Bookings.booking_id == payment.booking_id)
-        method = PaymentsMethods.get_or_none(PaymentsMethods.id == payment.method)
-        status = PaymentStatus.get_or_none(PaymentStatus.id == payment.payment_status)
-        
-        return {
-            'id': payment.id,
-            'Номер бронирования': booking.booking_number if booking else None,
-            'Сумма': payment.amount,
-            'Дата': payment.payment_date,
-            'Метод оплаты': method.method_name if method else None,
-            'Статус оплаты': status.status_payment if status else None
-        }
+        return PAYMENT_FIELDS.to_dict(names, payment)
         
     except HTTPException as http_exc:
         raise http_exc
@@ -1077,39 +1366,43 @@ async def get_payment_by_id(payment_id: int, token: str = Header(...)):
         raise HTTPException(500, f'Ошибка при получении платежа: {e}')
 
 
-@app.get('/payments/get_all_payments/', tags=['Payments'])
-async def get_all_payments(token: str = Header(...)):
-    """Получение всех платежей (только для администратора)"""
-    user = get_user_by_token(token, 'Администратор')
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
+@app.get('/payments/get_all_payments/', tags=['Payments'], response_class=FastJSONResponse)
+@query_budget(3)
+def get_all_payments(response: Response, page: Page = Depends(page_params),
+                     fields: Optional[str] = Depends(fields_param),
+                     user: CachedToken = Depends(require_role('Администратор')),
+                     conditional: None = Depends(conditional_get)):
+    """Получение платежей постранично (только для администратора)"""
     try:
-        payments = Payments.select()
-        result = []
-        for payment in payments:
-            booking = Bookings.get_or_none(Bookings.booking_id == payment.booking_id)
-            method = PaymentsMethods.get_or_none(PaymentsMethods.id == payment.method)
-            status = PaymentStatus.get_or_none(PaymentStatus.id == payment.payment_status)
-            result.append({
-                'id': payment.id,
-                'Номер бронирования': booking.booking_number if booking else None,
-                'Сумма': payment.amount,
-                'Дата': payment.payment_date,
-                'Метод оплаты': method.method_name if method else None,
-                'Статус оплаты': status.status_payment if status else None
-            })
-        return result
-    
+        names = PAYMENT_FIELDS.parse(fields)
+        payments, cursor = paginate(payments_query(*PAYMENT_FIELDS.columns(names)), PAYMENT_FIELDS.key, page)
+        set_next_cursor(response, cursor)
+        return fast_json([PAYMENT_FIELDS.to_dict(names, row) for row in payments], response)
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(500, f'Ошибка при получении списка платежей: {e}')
 
+PAYMENT_EXPORT_COLUMNS = ['id', 'booking_number', 'amount', 'payment_date', 'method', 'status']
+
+@app.get('/payments/export/', tags=['Payments'])
+def export_payments(export_format: str = Query('ndjson', alias='format', pattern=EXPORT_FORMAT_PATTERN),
+                    date_from: Optional[date] = None, date_to: Optional[date] = None, status: Optional[str] = None,
+                    user: CachedToken = Depends(require_role('Администратор'))):
+    """Выгрузка платежей в NDJSON или CSV потоком (только для администратора).
+    Фильтры: дата платежа с/по и статус оплаты"""
+    query = payments_query()
+    for condition in date_range(Payments.payment_date, date_from, date_to):
+        query = query.where(condition)
+    if status:
+        query = query.where(PaymentStatus.status_payment == status)
+    rows = iterate_all(query, [Payments.id])
+    return export_response(export_format, PAYMENT_EXPORT_COLUMNS, rows, 'payments')
+
 @app.delete('/payments/delete_payment/', tags=['Payments'])
-async def delete_payment(payment_id: int, token: str = Header(...)):
+def delete_payment(payment_id: int, user: CachedToken = Depends(require_role('Администратор'))):
     """Удаление платежа (только для администратора)"""
-    user = get_user_by_token(token, 'Администратор')
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-    
     try:
         payment = Payments.get_or_none(Payments.id == payment_id)
         if not payment:
@@ -1125,18 +1418,15 @@ async def delete_payment(payment_id: int, token: str = Header(...)):
         raise HTTPException(500, f'Ошибка при удалении платежа: {e}')
 
 @app.post('/destinations/create_destination/', tags=['Destinations'])
-async def create_destination(data: DestinationCreateSchema, token: str = Header(...)):
+def create_destination(data: DestinationCreateSchema, user: CachedToken = Depends(require_role('Администратор'))):
     """Создание направления (только для администратора)"""
-    user = get_user_by_token(token, 'Администратор')
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-    
     try:
         Destinations.create(
             name=data.name,
             country=data.country,
             description=data.description
         )
+        destination_search.invalidate()
         return {'message': 'Направление успешно создано.'}
     
     except HTTPException as http_exc:
@@ -1145,21 +1435,24 @@ async def create_destination(data: DestinationCreateSchema, token: str = Header(
     except Exception as e:
         raise HTTPException(500, f'Ошибка при создании направления: {e}')
             
-@app.get('/destinations/get_all/', tags=['Destinations'])
-async def get_all_destinations(token: str = Header(...)):
-    """Получение всех направлений"""
-    user = get_user_by_token(token)
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-    
+DESTINATION_FIELDS = Projection({
+    'id': FieldSpec('id', Destinations.id),
+    'city': FieldSpec('Город', Destinations.name),
+    'country': FieldSpec('Страна', Destinations.country),
+    'description': FieldSpec('Описание', Destinations.description),
+}, key=[Destinations.id])
+
+@app.get('/destinations/get_all/', tags=['Destinations'], response_class=FastJSONResponse)
+def get_all_destinations(response: Response, page: Page = Depends(page_params),
+                         fields: Optional[str] = Depends(fields_param), user: CachedToken = Depends(current_user),
+                         conditional: None = Depends(conditional_get)):
+    """Получение направлений постранично"""
     try:
-        destinations = Destinations.select()
-        return [{
-            'id': d.id,
-            'Город': d.name,
-            'Страна': d.country,
-            'Описание': d.description
-        } for d in destinations]
+        names = DESTINATION_FIELDS.parse(fields)
+        destinations, cursor = paginate(Destinations.select(*DESTINATION_FIELDS.columns(names)).tuples(),
+                                        DESTINATION_FIELDS.key, page)
+        set_next_cursor(response, cursor)
+        return fast_json([DESTINATION_FIELDS.to_dict(names, row) for row in destinations], response)
         
     except HTTPException as http_exc:
         raise http_exc
@@ -1168,12 +1461,8 @@ async def get_all_destinations(token: str = Header(...)):
         raise HTTPException(500, f'Ошибка при получении направлений: {e}')
     
 @app.patch('/destinations/update_destination/', tags=['Destinations'])
-async def update_destination(destination_id: int, data: DestinationUpdateSchema, token: str = Header(...)):
+def update_destination(destination_id: int, data: DestinationUpdateSchema, user: CachedToken = Depends(require_role('Администратор'))):
     """Обновление направления (только для администратора)"""
-    user = get_user_by_token(token, 'Администратор')
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-    
     try:
         destination = Destinations.get_or_none(Destinations.id == destination_id)
         if not destination:
@@ -1187,6 +1476,7 @@ async def update_destination(destination_id: int, data: DestinationUpdateSchema,
             destination.description = data.description
 
         destination.save()
+        destination_search.invalidate()
         return {'message': 'Направление успешно обновлено.'}
     except HTTPException as http_exc:
         raise http_exc
@@ -1194,47 +1484,51 @@ async def update_destination(destination_id: int, data: DestinationUpdateSchema,
         raise HTTPException(500, f'Ошибка при обновлении направления: {e}')
 
 @app.delete('/destinations/delete_destination/', tags=['Destinations'])
-async def delete_destination(destination_id: int, token: str = Header(...)):
+def delete_destination(destination_id: int, user: CachedToken = Depends(require_role('Администратор'))):
     """Удаление направления (только для администратора)"""
-    user = get_user_by_token(token, 'Администратор')
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-    
     try:
         destination = Destinations.get_or_none(Destinations.id == destination_id)
         if not destination:
             raise HTTPException(404, 'Направление не найдено.')
         
         destination.delete_instance()
-        
+        destination_search.invalidate()
         return {'message': 'Направление успешно удалено.'}
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
         raise HTTPException(500, f'Ошибка при удалении направления: {e}')
 
-@app.get('/destinations/search/', tags=['Destinations'])
-async def search_destinations(country: Optional[str] = None, city: Optional[str] = None, token: str = Header(...)):
+async def find_destinations(country: Optional[str], city: Optional[str]) -> list:
+    """Направления (город, страна, описание), подходящие под фильтры"""
+    query = Destinations.select(Destinations.name, Destinations.country, Destinations.description)
+    if country:
+        query = query.where(Destinations.country.ilike(f'%{country}%'))
+    if city:
+        query = query.where(Destinations.name.ilike(f'%{city}%'))
+    return await async_db.fetch_all(query)
+
+@app.get('/destinations/search/', tags=['Destinations'], response_class=FastJSONResponse)
+@query_budget(3)
+async def search_destinations(response: Response, country: Optional[str] = None, city: Optional[str] = None,
+                              user: CachedToken = Depends(current_user),
+                              conditional: None = Depends(conditional_get)):
     """Поиск направлений по стране/городу"""
-    user = get_user_by_token(token)
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-    
     try:
-        query = Destinations.select()
-        if country:
-            query = query.where(Destinations.country.ilike(f'%{country}%'))
-        if city:
-            query = query.where(Destinations.name.ilike(f'%{city}%'))
-        destinations = list(query)
+        country, city = (country or '').strip() or None, (city or '').strip() or None
+        destinations = destination_search.get((country, city))
+        if destinations is None:
+            version = destination_search.version
+            destinations = destination_search.set((country, city), version, await single_flight.run(
+                'destinations_search', (country, city, version), lambda: find_destinations(country, city)))
         if not destinations:
             raise HTTPException(404, 'Направления по заданным критериям не найдены.')
         
-        return [{
-            'Город': d.name,
-            'Страна': d.country,
-            'Описание': d.description
-        } for d in destinations]
+        return fast_json([{
+            'Город': name,
+            'Страна': country_name,
+            'Описание': description
+        } for name, country_name, description in destinations], response)
     
     except HTTPException as http_exc:
         raise http_exc
@@ -1242,14 +1536,9 @@ async def search_destinations(country: Optional[str] = None, city: Optional[str]
         raise HTTPException(500, f'Ошибка при поиске направлений: {e}')
 
 @app.post('/tour-destinations/create/', tags=['Tour Destinations'])
-async def create_tour_destination(data: TourDestinationCreateSchema, token: str = Header(...)):
+def create_tour_destination(data: TourDestinationCreateSchema, user: CachedToken = Depends(require_role('Администратор'))):
     """Создание связи тур-направление (только для администратора)"""
-    user = get_user_by_token(token, 'Администратор')
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-    
     try:
-
         tour = Tours.get_or_none(Tours.name == data.tour_name)
         if not tour:
             raise HTTPException(404, 'Тур с указанным названием не найден.')
@@ -1278,23 +1567,39 @@ async def create_tour_destination(data: TourDestinationCreateSchema, token: str
     except Exception as e:
         raise HTTPException(500, f'Ошибка при создании связи: {e}')
 
-@app.get('/tour-destinations/all/', tags=['Tour Destinations'])
-async def get_all_tour_destinations(token: str = Header(...)):
-    """Получение всех связей тур-направление"""
-    user = get_user_by_token(token)
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
+def tour_destinations_query(*columns):
+    """Связи тур-направление вместе с туром и направлением одним запросом"""
+    return (TourDestinations
+            .select(*columns)
+            .join_from(TourDestinations, Tours, on=(TourDestinations.tour_id == Tours.id))
+            .join_from(TourDestinations, Destinations, on=(TourDestinations.destinations_id == Destinations.id))
+            .tuples())
+
+TOUR_DESTINATION_FIELDS = Projection({
+    'id': FieldSpec('id', TourDestinations.id),
+    'tour': FieldSpec('Название тура', Tours.name),
+    'city': FieldSpec('Город', Destinations.name),
+    'country': FieldSpec('Страна', Destinations.country),
+}, key=[TourDestinations.id])
+
+DESTINATIONS_BY_TOUR_FIELDS = Projection({
+    **TOUR_DESTINATION_FIELDS.fields,
+    'description': FieldSpec('Описание', Destinations.description),
+}, key=[TourDestinations.id])
+
+@app.get('/tour-destinations/all/', tags=['Tour Destinations'], response_class=FastJSONResponse)
+@query_budget(3)
+def get_all_tour_destinations(response: Response, page: Page = Depends(page_params),
+                              fields: Optional[str] = Depends(fields_param),
+                              user: CachedToken = Depends(current_user),
+                              conditional: None = Depends(conditional_get)):
+    """Получение связей тур-направление постранично"""
     try:
-        tour_destinations = TourDestinations.select()
-        for td in tour_destinations:
-            tour = Tours.get_by_id(td.tour_id)
-            destination = Destinations.get_by_id(td.destinations_id)
-            return [{
-                'id': td.id,
-                'Название тура': tour.name,
-                'Город': destination.name,
-                'Страна': destination.country
-            }]
+        names = TOUR_DESTINATION_FIELDS.parse(fields)
+        links, cursor = paginate(tour_destinations_query(*TOUR_DESTINATION_FIELDS.columns(names)),
+                                 TOUR_DESTINATION_FIELDS.key, page)
+        set_next_cursor(response, cursor)
+        return fast_json([TOUR_DESTINATION_FIELDS.to_dict(names, row) for row in links], response)
     
     except HTTPException as http_exc:
         raise http_exc
@@ -1302,36 +1607,27 @@ async def get_all_tour_destinations(token: str = Header(...)):
     except Exception as e:
         raise HTTPException(500, f'Ошибка при получении данных: {e}')
     
-@app.get('/tour-destinations/get_by_tour/', tags=['Tour Destinations'])
-async def get_destinations_by_tour(tour_name: str, token: str = Header(...)):
-    """Получение направлений по названию тура"""
-    user = get_user_by_token(token)
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-    
+@app.get('/tour-destinations/get_by_tour/', tags=['Tour Destinations'], response_class=FastJSONResponse)
+@query_budget(4)
+def get_destinations_by_tour(tour_name: str, response: Response, page: Page = Depends(page_params),
+                             fields: Optional[str] = Depends(fields_param),
+                             user: CachedToken = Depends(current_user),
+                             conditional: None = Depends(conditional_get)):
+    """Получение направлений по названию тура (постранично)"""
     try:
-        tour = Tours.get_or_none(Tours.name == tour_name)
-        if not tour:
-            raise HTTPException(404, 'Тур с таким названием не найден.')
-
-        query = (TourDestinations.select().where(TourDestinations.tour_id == tour.id))
+        names = DESTINATIONS_BY_TOUR_FIELDS.parse(fields)
+        links, cursor = paginate(tour_destinations_query(*DESTINATIONS_BY_TOUR_FIELDS.columns(names))
+                                 .where(Tours.name == tour_name),
+                                 DESTINATIONS_BY_TOUR_FIELDS.key, page)
+        set_next_cursor(response, cursor)
+        result = [DESTINATIONS_BY_TOUR_FIELDS.to_dict(names, row) for row in links]
         
-        result = []
-        for td in query:
-            destination = Destinations.get_by_id(td.destinations_id)
-            
-            result.append({
-                'id': td.id,
-                'Название тура': tour.name,
-                'Город': destination.name,
-                'Страна': destination.country,
-                'Описание': destination.description
-            })
-        
-        if not result:
+        if not result and page.after is None:   # Пустая следующая страница - просто конец списка
+            if not Tours.select().where(Tours.name == tour_name).exists():
+                raise HTTPException(404, 'Тур с таким названием не найден.')
             return {'message': 'Для этого тура не найдено направлений'}
         
-        return result
+        return fast_json(result, response)
     
     except HTTPException:
         raise
@@ -1339,12 +1635,8 @@ async def get_destinations_by_tour(tour_name: str, token: str = Header(...)):
         raise HTTPException(500, f'Ошибка при получении данных: {e}')
 
 @app.put('/tour-destinations/update/', tags=['Tour Destinations'])
-async def update_tour_destination(data: TourDestinationUpdateSchema, token: str = Header(...)):
+def update_tour_destination(data: TourDestinationUpdateSchema, user: CachedToken = Depends(require_role('Администратор'))):
     """Обновление связи тур-направление (только для администратора)"""
-    user = get_user_by_token(token, 'Администратор')
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
-    
     try:
         old_tour = Tours.get_or_none(Tours.name == data.old_tour_name)
         if not old_tour:
@@ -1382,11 +1674,8 @@ async def update_tour_destination(data: TourDestinationUpdateSchema, token: str
         raise HTTPException(500, f'Ошибка при обновлении связи: {e}')
 
 @app.delete('/tour-destinations/delete/', tags=['Tour Destinations'])
-async def delete_tour_destination(td_id: int, token: str = Header(...)):
+def delete_tour_destination(td_id: int, user: CachedToken = Depends(require_role('Администратор'))):
     """Удаление связи тур-направление (только для администратора)"""
-    user = get_user_by_token(token, 'Администратор')
-    if not user:
-        raise HTTPException(401, 'Неверный токен авторизации.')
     try:
         link = TourDestinations.get_or_none(TourDestinations.id == td_id)
         if not link:
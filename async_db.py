@@ -0,0 +1,207 @@
+"""Асинхронный доступ к БД для самых нагруженных эндпоинтов
+
+SQL по-прежнему строится моделями peewee (query.sql()), а выполняется асинхронным
+драйвером, поэтому запросы не занимают потоки на время ожидания MySQL:
+    aiomysql   - пул асинхронных соединений к MySQL (боевой режим);
+    aiosqlite  - файл SQLite, замена MySQL для тестов и локальной разработки;
+    threadpool - обычный peewee в пуле потоков (по умолчанию, без доп. зависимостей).
+Все драйверы принимают запросы peewee и возвращают кортежи уже преобразованных значений.
+"""
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional
+from peewee import Insert, Select
+from starlette.concurrency import run_in_threadpool
+from query_recorder import record_query
+import asyncio
+import sys
+import time
+
+
+def _convert(query, row: tuple) -> tuple:
+    """Приводит значения строки к типам полей peewee (например, строки SQLite в datetime)"""
+    converters = [getattr(column, 'python_value', None) for column in query._returning]
+    return tuple(convert(value) if convert and value is not None else value
+                 for convert, value in zip(converters, row))
+
+
+class ThreadPoolDriver:
+    """Выполняет запросы peewee синхронно в пуле потоков"""
+
+    def __init__(self, database):
+        self.database = database
+
+    async def connect(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def fetch_all(self, query: Select) -> list:
+        return await run_in_threadpool(lambda: list(query.tuples()))
+
+    async def fetch_one(self, query: Select) -> Optional[tuple]:
+        return await run_in_threadpool(lambda: query.tuples().first())
+
+    async def execute(self, query) -> int:
+        return await run_in_threadpool(query.execute)
+
+    @asynccontextmanager
+    async def transaction(self):
+        atomic = self.database.atomic()
+        await run_in_threadpool(atomic.__enter__)
+        try:
+            yield
+        except BaseException:
+            await run_in_threadpool(atomic.__exit__, *sys.exc_info())
+            raise
+        await run_in_threadpool(atomic.__exit__, None, None, None)
+
+
+class _AsyncDriver:
+    """Общая часть асинхронных драйверов: выбор соединения и выполнение SQL"""
+
+    param = '%s'
+
+    def __init__(self):
+        self._transaction_conn = ContextVar(f'{type(self).__name__}_conn', default=None)
+
+    def _sql(self, query) -> tuple[str, list]:
+        sql, params = query.sql()
+        if self.param != '%s':
+            sql = sql.replace('%s', self.param)
+        return sql, params
+
+    async def fetch_all(self, query: Select) -> list:
+        sql, params = self._sql(query)
+        started = time.perf_counter()
+        try:
+            async with self._connection() as conn:
+                rows = await self._fetch(conn, sql, params)
+        finally:
+            record_query(sql, time.perf_counter() - started)
+        return [_convert(query, row) for row in rows]
+
+    async def fetch_one(self, query: Select) -> Optional[tuple]:
+        rows = await self.fetch_all(query.limit(1))
+        return rows[0] if rows else None
+
+    async def execute(self, query) -> int:
+        """Для INSERT возвращает id новой строки, иначе число измененных строк"""
+        sql, params = self._sql(query)
+        started = time.perf_counter()
+        try:
+            async with self._connection() as conn:
+                lastrowid, rowcount = await self._execute(conn, sql, params)
+        finally:
+            record_query(sql, time.perf_counter() - started)
+        return lastrowid if isinstance(query, Insert) else rowcount
+
+    @asynccontextmanager
+    async def _connection(self):
+        conn = self._transaction_conn.get()
+        if conn is not None:
+            yield conn
+            return
+        async with self._acquire() as conn:
+            yield conn
+
+    @asynccontextmanager
+    async def transaction(self):
+        """Все запросы внутри блока выполняются на одном соединении в одной транзакции"""
+        if self._transaction_conn.get() is not None:
+            yield
+            return
+        async with self._acquire() as conn:
+            token = self._transaction_conn.set(conn)
+            await self._begin(conn)
+            try:
+                yield
+            except BaseException:
+                await conn.rollback()
+                raise
+            else:
+                await conn.commit()
+            finally:
+                self._transaction_conn.reset(token)
+
+
+class AioMySQLDriver(_AsyncDriver):
+    """Пул асинхронных соединений aiomysql"""
+
+    def __init__(self, database: str, minsize: int = 1, maxsize: int = 20, pool_recycle: int = -1, **connect_params):
+        super().__init__()
+        self.database = database
+        self.minsize = minsize
+        self.maxsize = maxsize
+        self.pool_recycle = pool_recycle
+        self.connect_params = connect_params
+        self._pool = None
+
+    async def connect(self) -> None:
+        import aiomysql
+        self._pool = await aiomysql.create_pool(
+            db=self.database, minsize=self.minsize, maxsize=self.maxsize,
+            pool_recycle=self.pool_recycle, autocommit=True, **self.connect_params
+        )
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            self._pool.close()
+            await self._pool.wait_closed()
+            self._pool = None
+
+    @asynccontextmanager
+    async def _acquire(self):
+        async with self._pool.acquire() as conn:
+            yield conn
+
+    async def _begin(self, conn) -> None:
+        await conn.begin()
+
+    async def _fetch(self, conn, sql: str, params: list) -> list:
+        async with conn.cursor() as cursor:
+            await cursor.execute(sql, params)
+            return await cursor.fetchall()
+
+    async def _execute(self, conn, sql: str, params: list) -> tuple[int, int]:
+        async with conn.cursor() as cursor:
+            await cursor.execute(sql, params)
+            return cursor.lastrowid, cursor.rowcount
+
+
+class AioSQLiteDriver(_AsyncDriver):
+    """Одно соединение aiosqlite; транзакции выполняются по очереди"""
+
+    param = '?'
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._conn = None
+        self._lock = asyncio.Lock()
+
+    async def connect(self) -> None:
+        import aiosqlite
+        self._conn = await aiosqlite.connect(self.path, isolation_level=None)
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    @asynccontextmanager
+    async def _acquire(self):
+        async with self._lock:
+            yield self._conn
+
+    async def _begin(self, conn) -> None:
+        await conn.execute('BEGIN')
+
+    async def _fetch(self, conn, sql: str, params: list) -> list:
+        async with conn.execute(sql, params) as cursor:
+            return await cursor.fetchall()
+
+    async def _execute(self, conn, sql: str, params: list) -> tuple[int, int]:
+        async with conn.execute(sql, params) as cursor:
+            return cursor.lastrowid, cursor.rowcount
@@ -0,0 +1,41 @@
+"""Периодические фоновые задачи процесса API"""
+import threading
+from database import db_connection
+
+
+class PeriodicTask:
+    """Вызывает функцию в отдельном потоке каждые interval секунд.
+
+    На время каждого вызова поток берет соединение из пула и затем возвращает его.
+    """
+
+    def __init__(self, name: str, interval: float, func):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        """Запускает поток, если интервал положительный и поток еще не запущен"""
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Останавливает поток и дожидается его завершения"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            try:
+                with db_connection.connection_context():
+                    self.func()
+            except Exception as e:
+                print(f'Ошибка в фоновой задаче {self.name}: {e}')
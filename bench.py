@@ -0,0 +1,98 @@
+"""Нагрузочный тест API: смешанная нагрузка на чтение, задержки p50/p95/p99
+
+Пример запуска (сервер должен быть запущен: uvicorn api:app):
+    python bench.py --email admin@mail.ru --password admin --requests 2000 --concurrency 50
+
+Список всех платежей на 100 тыс. строк:
+    python manage.py seed-synthetic --users 1000 --bookings 125000
+    python bench.py --email admin@mail.ru --password admin --scenario payments --requests 50 --concurrency 5
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import random
+import statistics
+import threading
+import time
+import requests
+
+MIXED_LOAD = [
+    ('/tours/get_tours/', {}),
+    ('/destinations/search/', {'country': 'Россия'}),
+    ('/destinations/get_all/', {}),
+    ('/statusbooking/get_all/', {}),
+    ('/booking/all_bookings/', {}),
+    ('/payments/get_all_payments/', {}),
+]
+
+SCENARIOS = {
+    'mixed': MIXED_LOAD,
+    'payments': [('/payments/get_all_payments/', {})],
+}
+
+
+def percentile(values: list, percent: float) -> float:
+    """Перцентиль по отсортированному списку"""
+    index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+    return values[index]
+
+def login(url: str, email: str, password: str) -> str:
+    """Получение токена администратора"""
+    response = requests.post(f'{url}/users/auth/', json={'email': email, 'password': password}, timeout=30)
+    response.raise_for_status()
+    return response.json()['token']
+
+def run(url: str, token: str, total: int, concurrency: int, load: list) -> dict:
+    """Выполняет total запросов в concurrency потоков; возвращает задержки по эндпоинтам"""
+    local = threading.local()
+    latencies = {path: [] for path, _ in load}
+    errors = []
+
+    def one_request(i):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        path, params = load[i % len(load)]
+        started = time.perf_counter()
+        response = local.session.get(f'{url}{path}', params=params, headers={'token': token}, timeout=60)
+        elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code >= 500:
+            errors.append(response.status_code)
+        latencies[path].append(elapsed)
+
+    order = list(range(total))
+    random.shuffle(order)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one_request, order))
+    duration = time.perf_counter() - started
+    return {'latencies': latencies, 'errors': len(errors), 'duration': duration}
+
+def report(result: dict, total: int) -> None:
+    """Печатает таблицу задержек"""
+    print(f'{"эндпоинт":<32}{"n":>6}{"p50":>10}{"p95":>10}{"p99":>10}')
+    everything = []
+    for path, values in result['latencies'].items():
+        values.sort()
+        everything.extend(values)
+        if values:
+            print(f'{path:<32}{len(values):>6}{percentile(values, 50):>10.1f}'
+                  f'{percentile(values, 95):>10.1f}{percentile(values, 99):>10.1f}')
+    everything.sort()
+    print(f'{"всего":<32}{len(everything):>6}{percentile(everything, 50):>10.1f}'
+          f'{percentile(everything, 95):>10.1f}{percentile(everything, 99):>10.1f}')
+    print(f'среднее {statistics.mean(everything):.1f} мс, {total / result["duration"]:.0f} запросов/с, '
+          f'ошибок 5xx: {result["errors"]}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Нагрузочный тест API')
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--email', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--scenario', choices=SCENARIOS, default='mixed')
+    args = parser.parse_args()
+
+    token = login(args.url, args.email, args.password)
+    result = run(args.url, token, args.requests, args.concurrency, SCENARIOS[args.scenario])
+    report(result, args.requests)
@@ -0,0 +1,73 @@
+"""Микробенчмарк сериализации списков: стандартный путь FastAPI против FastJSONResponse
+
+Строки похожи на ответ /payments/get_all_payments/ (кириллические ключи, даты, числа).
+Пример запуска (сервер и БД не нужны):
+    python bench_json.py --rows 10000 100000 --repeat 5
+"""
+from datetime import date, datetime, timedelta
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fast_json import FastJSONResponse, _default
+import argparse
+import json
+import statistics
+import time
+
+
+def make_rows(count: int) -> list:
+    """Синтетические платежи"""
+    started = datetime(2025, 1, 1, 9, 30)
+    return [{
+        'ID платежа': i,
+        'Номер бронирования': f'S{i:09d}',
+        'Сумма': 15000 + i % 1000,
+        'Дата оплаты': started + timedelta(minutes=i),
+        'Дата тура': date(2025, 6, 1) + timedelta(days=i % 90),
+        'Способ оплаты': 'Банковская карта',
+        'Статус оплаты': 'Оплачено' if i % 5 else 'Ожидает оплаты',
+    } for i in range(count)]
+
+def fastapi_default(rows: list) -> bytes:
+    """Как FastAPI без response_class: jsonable_encoder, затем JSONResponse"""
+    return JSONResponse(jsonable_encoder(rows)).body
+
+def fast_response(rows: list) -> bytes:
+    """FastJSONResponse (orjson, если установлен)"""
+    return FastJSONResponse(rows).body
+
+def stdlib_fallback(rows: list) -> bytes:
+    """Запасной путь FastJSONResponse без orjson"""
+    return json.dumps(rows, ensure_ascii=False, separators=(',', ':'), default=_default).encode('utf-8')
+
+VARIANTS = {
+    'jsonable_encoder + json': fastapi_default,
+    'FastJSONResponse': fast_response,
+    'json без orjson': stdlib_fallback,
+}
+
+
+def measure(func, rows: list, repeat: int) -> float:
+    """Медианное время одного вызова, мс"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(rows)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Микробенчмарк сериализации JSON')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f'{"вариант":<28}{"строк":>8}{"мс":>10}{"x":>8}{"КБ":>10}')
+    for count in args.rows:
+        rows = make_rows(count)
+        assert json.loads(fastapi_default(rows)) == json.loads(fast_response(rows)) == json.loads(stdlib_fallback(rows))
+        baseline = None
+        for name, func in VARIANTS.items():
+            elapsed = measure(func, rows, args.repeat)
+            baseline = baseline or elapsed
+            print(f'{name:<28}{count:>8}{elapsed:>10.1f}{baseline / elapsed:>8.1f}{len(func(rows)) / 1024:>10.0f}')
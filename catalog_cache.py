@@ -0,0 +1,24 @@
+"""Кэш каталога туров: готовые JSON-ответы в байтах по версии каталога
+
+Каждая страница списка туров (размер, курсор, набор полей) хранится уже сериализованной
+вместе с ETag. Создание, изменение и удаление тура увеличивают версию каталога (invalidate) - записи
+старых версий больше не отдаются. Изменения из других процессов подхватываются через ttl секунд.
+"""
+from typing import NamedTuple
+from conditional import make_etag
+from result_cache import ResultCache
+
+
+class CachedResponse(NamedTuple):
+    """Сериализованный ответ: тело, ETag, дополнительные заголовки"""
+    body: bytes
+    etag: str
+    headers: dict
+
+
+class CatalogCache(ResultCache):
+    """LRU-кэш сериализованных страниц каталога с версией"""
+
+    def set(self, key, version: int, body: bytes, headers: dict = None) -> CachedResponse:
+        """Сохраняет ответ, построенный по данным версии version; устаревший не сохраняется"""
+        return super().set(key, version, CachedResponse(body, make_etag(body), headers or {}))
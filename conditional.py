@@ -0,0 +1,83 @@
+"""Условные GET-запросы: ETag / If-None-Match
+
+ETag ответа - хеш его тела, поэтому он одинаков во всех процессах API для одинаковых данных
+и меняется при любом их изменении, кем бы оно ни было сделано. Обработчик выполняется как обычно,
+а при совпадении ETag с If-None-Match клиенту вместо тела уходит 304 - без передачи и разбора данных.
+Потоковые ответы (из нескольких частей) передаются без ETag, чтобы не собирать их в памяти.
+"""
+from contextvars import ContextVar
+from typing import Optional
+import hashlib
+
+_conditional = ContextVar('conditional_get', default=None)
+
+
+def make_etag(body: bytes) -> str:
+    """Сильный ETag по содержимому: одинаков во всех процессах API"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Совпадает ли ETag с заголовком If-None-Match (список значений, W/-префикс, *)"""
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(',')]
+    return '*' in candidates or etag in [value.removeprefix('W/') for value in candidates]
+
+async def conditional_get() -> None:
+    """Зависимость для GET-эндпоинта: ETag по телу ответа, 304 при совпадении с If-None-Match"""
+    state = _conditional.get()
+    if state is not None:
+        state['enabled'] = True
+
+
+class ConditionalGetMiddleware:
+    """ASGI-middleware: ответы эндпоинтов с зависимостью conditional_get получают ETag по телу;
+    если он совпал с If-None-Match, вместо ответа 200 отправляется 304 без тела"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] != 'GET':
+            await self.app(scope, receive, send)
+            return
+        state = {}
+        start = None
+        token = _conditional.set(state)
+
+        async def conditional_send(message):
+            nonlocal start
+            if message['type'] == 'http.response.start':
+                if state and message['status'] == 200:
+                    start = message   # Заголовки отправляются вместе с телом, когда известен ETag
+                    return
+            elif start is not None:
+                response_start, start = start, None
+                if message.get('more_body', False):
+                    await send(response_start)
+                else:
+                    await self._send_complete(scope, response_start, message, send)
+                    return
+            await send(message)
+
+        try:
+            await self.app(scope, receive, conditional_send)
+        finally:
+            _conditional.reset(token)
+
+    @staticmethod
+    async def _send_complete(scope, start: dict, message: dict, send) -> None:
+        """Ответ целиком в одном сообщении: 200 с ETag или 304"""
+        etag = make_etag(message.get('body', b''))
+        headers = [(name, value) for name, value in start['headers'] if name.lower() != b'etag']
+        headers += [(b'etag', etag.encode('ascii')), (b'cache-control', b'no-cache')]
+        if_none_match = next((value.decode('latin-1') for name, value in scope['headers']
+                              if name == b'if-none-match'), None)
+        if etag_matches(if_none_match, etag):
+            headers = [(name, value) for name, value in headers
+                       if name.lower() not in (b'content-length', b'content-type')]
+            await send({**start, 'status': 304, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        await send({**start, 'headers': headers})
+        await send(message)
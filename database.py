@@ -1,6 +1,14 @@
-from peewee import MySQLDatabase
+from contextvars import ContextVar
+from peewee import _ConnectionState
+from playhouse.pool import PooledMySQLDatabase, MaxConnectionsExceeded
 from pymysql import MySQLError
+from dotenv import load_dotenv
+from query_recorder import record_query
 import pymysql
+import os
+import time
+
+load_dotenv()
 
 DB_HOST = 'localhost'     # Хост базы данных
 DB_PORT = 3306            # Порт базы данных
@@ -8,13 +16,19 @@ DB_USERNAME = 'root'      # Имя пользователя БД
 DB_PASSWORD = 'root'      # Пароль пользователя БД
 DB_NAME = 'tourist_ag'    # Название базы данных
 
+DB_MAX_CONNECTIONS = int(os.getenv('DB_MAX_CONNECTIONS', 20))   # Максимум соединений в пуле на процесс
+DB_STALE_TIMEOUT = int(os.getenv('DB_STALE_TIMEOUT', 300))      # Через сколько секунд соединение пересоздается
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 10))         # Сколько секунд ждать свободного соединения
+
 def init_database():
     """Инициализация базы данных - создает БД если она не существует"""
+    connection = None
     try:
         connection = pymysql.connect(
             host=DB_HOST,
-            user=DB_USERNAME, 
-            password=DB_PASSWORD 
+            port=DB_PORT,
+            user=DB_USERNAME,
+            password=DB_PASSWORD
         )
 
         with connection.cursor() as cursor:
@@ -24,15 +38,111 @@ def init_database():
     except MySQLError as e:
         print(f"Error creating database: {e}")
     finally:
-        connection.close()
-
-init_database() # Инициализация базы данных при запуске приложения
-
-"""Создание подключения к базе данных с использованием Peewee ORM"""
-db_connection = MySQLDatabase(
-    DB_NAME, 
-    user=DB_USERNAME, 
-    password=DB_PASSWORD, 
-    host=DB_HOST, 
-    port=DB_PORT
-)
\ No newline at end of file
+        if connection is not None:
+            connection.close()
+
+
+class ContextConnectionState:
+    """Состояние соединения peewee, привязанное к контексту запроса, а не к потоку.
+
+    Асинхронные обработчики выполняются в одном потоке цикла событий, поэтому
+    стандартное thread-local состояние делило бы одно соединение между всеми
+    запросами. Здесь у каждого запроса (и каждого фонового потока) свое состояние.
+    """
+
+    def __init__(self):
+        object.__setattr__(self, '_var', ContextVar('db_connection_state', default=None))
+
+    def _current(self) -> _ConnectionState:
+        state = self._var.get()
+        if state is None:
+            state = _ConnectionState()
+            self._var.set(state)
+        return state
+
+    def reset_context(self) -> None:
+        """Начинает новое состояние для текущего контекста (нового запроса)"""
+        self._var.set(_ConnectionState())
+
+    def __getattr__(self, name):
+        return getattr(self._current(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._current(), name, value)
+
+
+class MonitoredPoolMixin:
+    """Метрики насыщения пула соединений peewee, учет запросов (query_recorder)
+    и состояние соединения по контексту запроса"""
+
+    def __init__(self, *args, **kwargs):
+        self.checkouts = 0
+        self.saturated = 0
+        self.peak_in_use = 0
+        super().__init__(*args, **kwargs)
+        self._state = ContextConnectionState()
+
+    def _connect(self):
+        try:
+            conn = super()._connect()
+        except MaxConnectionsExceeded:
+            self.saturated += 1
+            raise
+        self.checkouts += 1
+        self.peak_in_use = max(self.peak_in_use, len(self._in_use))
+        return conn
+
+    def execute_sql(self, sql, params=None, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().execute_sql(sql, params, *args, **kwargs)
+        finally:
+            record_query(sql, time.perf_counter() - started)
+
+    def stats(self) -> dict:
+        """Метрики пула: занято, свободно, максимум, выдано, отказов из-за насыщения"""
+        return {
+            'max_connections': self._max_connections,
+            'in_use': len(self._in_use),
+            'idle': len(self._connections),
+            'peak_in_use': self.peak_in_use,
+            'checkouts': self.checkouts,
+            'saturated': self.saturated,
+        }
+
+
+class MonitoredPooledMySQLDatabase(MonitoredPoolMixin, PooledMySQLDatabase):
+    """Пул соединений MySQL с метриками насыщения и учетом запросов (query_recorder)"""
+
+
+class ConnectionPerRequestMiddleware:
+    """ASGI-middleware: соединение берется из пула при первом запросе к БД
+    и возвращается в пул после отправки ответа (в том числе потокового)"""
+
+    def __init__(self, app, database):
+        self.app = app
+        self.database = database
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        self.database._state.reset_context()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if not self.database.is_closed():
+                self.database.close()
+
+
+"""Создание пула подключений к базе данных с использованием Peewee ORM"""
+db_connection = MonitoredPooledMySQLDatabase(
+    DB_NAME,
+    user=DB_USERNAME,
+    password=DB_PASSWORD,
+    host=DB_HOST,
+    port=DB_PORT,
+    max_connections=DB_MAX_CONNECTIONS,
+    stale_timeout=DB_STALE_TIMEOUT,
+    timeout=DB_POOL_TIMEOUT
+)
@@ -8,6 +8,54 @@ from PIL import Image, ImageTk
 from io import BytesIO
 import datetime
 
+PAGE_SIZE = 1000   # Размер страницы при загрузке списков
+
+
+class PagedResponse:
+    """Список, собранный со всех страниц: status_code и json() как у requests.Response"""
+    def __init__(self, response, items):
+        self.status_code = 200   # Последняя страница могла прийти как 304 из кэша
+        self.headers = response.headers
+        self._items = items
+
+    def json(self):
+        return self._items
+
+
+_page_cache = {}   # (url, параметры, cursor) -> (ETag, строки страницы, курсор следующей)
+
+
+def get_all_pages(url, headers=None, params=None, timeout=5):
+    """Загружает все страницы списка, переходя по курсору из заголовка X-Next-Cursor.
+    Уже загруженные страницы перепроверяются по ETag: при ответе 304 берутся из памяти.
+    Ответ не списком (сообщение вместо пустого списка) возвращается как есть"""
+    items = []
+    cursor = None
+    query = tuple(sorted((params or {}).items()))
+    while True:
+        page_params = {**(params or {}), 'limit': PAGE_SIZE}
+        if cursor:
+            page_params['cursor'] = cursor
+        cached = _page_cache.get((url, query, cursor))
+        request_headers = dict(headers or {})
+        if cached:
+            request_headers['If-None-Match'] = cached[0]
+        response = requests.get(url, headers=request_headers, params=page_params, timeout=timeout)
+        if response.status_code == 304 and cached:
+            page, next_cursor = cached[1], cached[2]
+        elif response.status_code == 200:
+            page, next_cursor = response.json(), response.headers.get('X-Next-Cursor')
+            if not isinstance(page, list):
+                return response
+            if response.headers.get('ETag'):
+                _page_cache[(url, query, cursor)] = (response.headers['ETag'], page, next_cursor)
+        else:
+            return response
+        items.extend(page)
+        if not next_cursor:
+            return PagedResponse(response, items)
+        cursor = next_cursor
+
 # os.environ['TCL_LIBRARY'] = r'C:\Users\User\AppData\Local\Programs\Python\Python311\tcl\tcl8.6'
 # os.environ['TK_LIBRARY'] = r'C:\Users\User\AppData\Local\Programs\Python\Python311\tcl\tk8.6'
 
@@ -165,7 +213,7 @@ class MainApp:
         canvas.bind_all('<MouseWheel>', lambda event: canvas.yview_scroll(int(-1*(event.delta/120)), 'units'))
         
         try:
-            response = requests.get(
+            response = get_all_pages(
                 'http://127.0.0.1:8000/tours/get_tours/',
                 headers={'token': self.token},
                 timeout=5
@@ -1046,7 +1094,7 @@ class MainApp:
     def show_tour_destinations(self, tour):
         """Показать направления для конкретного тура"""
         try:
-            response = requests.get(
+            response = get_all_pages(
                 'http://127.0.0.1:8000/tour-destinations/get_by_tour/',
                 headers={'token': self.token},
                 params={'tour_name': tour['name']},
@@ -1072,7 +1120,7 @@ class MainApp:
             self.users_tree.delete(item)
         
         try:
-            response = requests.get(
+            response = get_all_pages(
                 'http://127.0.0.1:8000/users/get_all/',
                 headers={'token': self.token},
                 timeout=5
@@ -1238,7 +1286,7 @@ class MainApp:
             self.tours_tree.delete(item)
         
         try:
-            response = requests.get(
+            response = get_all_pages(
                 'http://127.0.0.1:8000/tours/get_tours/',
                 headers={'token': self.token},
                 timeout=5
@@ -1620,7 +1668,7 @@ class MainApp:
             self.status_tree.delete(item)
         
         try:
-            response = requests.get(
+            response = get_all_pages(
                 'http://127.0.0.1:8000/statusbooking/get_all/',
                 headers={'token': self.token},
                 timeout=5
@@ -1832,7 +1880,7 @@ class MainApp:
             self.bookings_tree.delete(item)
         
         try:
-            response = requests.get(
+            response = get_all_pages(
                 'http://127.0.0.1:8000/booking/all_bookings/',
                 headers={'token': self.token},
                 timeout=5
@@ -1898,7 +1946,7 @@ class MainApp:
 
         tk.Label(dialog, text='Статус:').pack(pady=5)
         try:
-            status_response = requests.get(
+            status_response = get_all_pages(
                 'http://127.0.0.1:8000/statusbooking/get_all/',
                 headers={'token': self.token},
                 timeout=5
@@ -1989,7 +2037,7 @@ class MainApp:
             self.payments_tree.delete(item)
         
         try:
-            response = requests.get(
+            response = get_all_pages(
                 'http://127.0.0.1:8000/payments/get_all_payments/',
                 headers={'token': self.token},
                 timeout=5
@@ -2185,7 +2233,7 @@ class MainApp:
             self.dest_tree.delete(item)
         
         try:
-            response = requests.get(
+            response = get_all_pages(
                 'http://127.0.0.1:8000/destinations/get_all/',
                 headers={'token': self.token},
                 timeout=5
@@ -0,0 +1,44 @@
+"""Быстрая сериализация JSON для больших ответов
+
+Обработчик возвращает fast_json(данные) вместо списка словарей: FastAPI не прогоняет результат
+через jsonable_encoder, а данные кодируются orjson (даты и время - нативно, в ISO 8601).
+Без orjson используется стандартный json с тем же форматом дат.
+"""
+from datetime import date, datetime
+from typing import Optional
+from fastapi.responses import JSONResponse
+from starlette.responses import Response
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+def dumps(content) -> bytes:
+    """JSON в UTF-8; даты и время в ISO 8601"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(',', ':'), default=_default).encode('utf-8')
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON-ответ, сериализуемый orjson"""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def fast_json(content, response: Optional[Response] = None, status_code: int = 200) -> FastJSONResponse:
+    """Готовый ответ в обход jsonable_encoder; заголовки, выставленные обработчиком
+    через параметр response (например, X-Next-Cursor), переносятся в ответ"""
+    result = FastJSONResponse(content, status_code=status_code)
+    if response is not None:
+        result.headers.raw.extend(response.headers.raw)
+    return result
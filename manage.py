@@ -0,0 +1,70 @@
+"""Подготовка базы данных: создание БД, таблиц и начальных данных
+
+Выполняется один раз перед запуском воркеров, сами воркеры схему не трогают:
+    python manage.py init
+    uvicorn api:app --workers 4
+
+Данные для нагрузочных тестов:
+    python manage.py seed-synthetic --users 1000 --bookings 100000
+"""
+from contextlib import contextmanager
+import argparse
+from database import db_connection, init_database, DB_NAME
+from models import initialize_tables, seed_database, seed_synthetic
+
+LOCK_TIMEOUT = 60   # Сколько секунд ждать, пока другой экземпляр закончит подготовку БД
+
+
+@contextmanager
+def exclusive():
+    """Соединение с именованной блокировкой MySQL: параллельные запуски выполняются по очереди"""
+    lock_name = f'{DB_NAME}_manage'
+    with db_connection.connection_context():
+        if not db_connection.execute_sql('SELECT GET_LOCK(%s, %s)', (lock_name, LOCK_TIMEOUT)).fetchone()[0]:
+            raise RuntimeError('Не удалось дождаться завершения другой подготовки БД.')
+        try:
+            yield
+        finally:
+            db_connection.execute_sql('SELECT RELEASE_LOCK(%s)', (lock_name,))
+
+def migrate():
+    """Создание недостающих таблиц"""
+    with exclusive():
+        initialize_tables()
+
+def seed():
+    """Заполнение справочников и демонстрационных данных"""
+    with exclusive():
+        seed_database()
+
+def synthetic(users: int, bookings: int, paid_ratio: float):
+    """Массовая загрузка синтетических данных для нагрузочных тестов"""
+    with exclusive():
+        seed_synthetic(users, bookings, paid_ratio)
+
+def init():
+    """Полная подготовка: БД, таблицы, начальные данные"""
+    init_database()
+    with exclusive():
+        initialize_tables()
+        seed_database()
+
+COMMANDS = {
+    'init-db': lambda args: init_database(),
+    'migrate': lambda args: migrate(),
+    'seed': lambda args: seed(),
+    'seed-synthetic': lambda args: synthetic(args.users, args.bookings, args.paid_ratio),
+    'init': lambda args: init(),
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Подготовка базы данных')
+    parser.add_argument('command', choices=COMMANDS, help='init-db - создать БД, migrate - создать таблицы, '
+                                                          'seed - начальные данные, seed-synthetic - данные '
+                                                          'для нагрузочных тестов, init - все сразу')
+    parser.add_argument('--users', type=int, default=1000, help='seed-synthetic: сколько пользователей добавить')
+    parser.add_argument('--bookings', type=int, default=100000, help='seed-synthetic: сколько бронирований добавить')
+    parser.add_argument('--paid-ratio', type=float, default=0.8, help='seed-synthetic: доля оплаченных бронирований')
+    args = parser.parse_args()
+    COMMANDS[args.command](args)
@@ -1,10 +1,12 @@
 """Модели базы данных и инициализация"""
-from peewee import Model, CharField, AutoField, IntegerField, ForeignKeyField, DateTimeField, Check, DateField
+from peewee import Model, CharField, AutoField, IntegerField, BigIntegerField, ForeignKeyField, DateTimeField, Check, DateField
+from peewee import chunked
 from database import db_connection
 import datetime
+import random
 from dotenv import load_dotenv
 import os
-import hashlib
+from passwords import hash_password
 
 load_dotenv()
 
@@ -100,7 +102,27 @@ class TourDestinations(BaseModel):
     tour_id = ForeignKeyField(Tours, backref='tour_dest', on_delete='CASCADE', null=False)
     destinations_id = ForeignKeyField(Destinations, backref='dest_tour', on_delete='CASCADE', null=False)
 
-tables = [Roles, Users, Tours, StatusBooking, Bookings, PaymentsMethods, PaymentStatus, Payments, Destinations, TourDestinations, PasswordChangeRequest]
+class Sessions(BaseModel):
+    """Сессии пользователей (по одной на устройство), ключ - хеш токена"""
+    token_hash = CharField(max_length=64, primary_key=True)
+    user_id = IntegerField(null=False, index=True)
+    role = CharField(max_length=20, null=False)
+    device = CharField(max_length=255, null=True)
+    created_at = DateTimeField(null=False)
+    expires_at = DateTimeField(null=False, index=True)
+
+class TokenRevocations(BaseModel):
+    """Отзыв подписанных токенов: токены пользователя, выданные раньше revoked_before (мс), недействительны"""
+    user_id = IntegerField(primary_key=True)
+    revoked_before = BigIntegerField(null=False, index=True)
+
+class RevokedTokens(BaseModel):
+    """Отзыв одного подписанного токена (выход на одном устройстве) по его случайному идентификатору jti;
+    запись не нужна после expires_at (мс) - истечения срока токена"""
+    jti = CharField(max_length=32, primary_key=True)
+    expires_at = BigIntegerField(null=False, index=True)
+
+tables = [Roles, Users, Tours, StatusBooking, Bookings, PaymentsMethods, PaymentStatus, Payments, Destinations, TourDestinations, PasswordChangeRequest, Sessions, TokenRevocations, RevokedTokens]
 
 
 def initialize_tables():
@@ -108,249 +130,263 @@ def initialize_tables():
     db_connection.create_tables(tables, safe=True)
     print('Tables is initialized')
 
-def create_roles():
+ROLES = [
+    {'name': 'Пользователь'},
+    {'name': 'Администратор'},
+]
+
+TOURS = [
+    {
+        "name": "Отдых в Сочи",
+        "description": "Прекрасный отдых на черноморском побережье",
+        "price": 25000,
+        "days": 7,
+        "country": "Россия",
+        "image_filename": "tour1.jpg"
+    },
+    {
+        "name": "Горный Алтай",
+        "description": "Приключения в горах Алтая",
+        "price": 18000,
+        "days": 5,
+        "country": "Россия",
+        "image_filename": "tour2.jpg"
+    },
+    {
+        "name": "Турция, Анталия",
+        "description": "Все включено на берегу Средиземного моря",
+        "price": 35000,
+        "days": 10,
+        "country": "Турция",
+        "image_filename": "tour3.jpg"
+    },
+    {
+        "name": "Египет, Хургада",
+        "description": "Погружение в мир коралловых рифов",
+        "price": 40000,
+        "days": 8,
+        "country": "Египет",
+        "image_filename": "tour4.jpg"
+    },
+    {
+        "name": "Италия, Рим",
+        "description": "Экскурсионный тур по историческим местам",
+        "price": 55000,
+        "days": 6,
+        "country": "Италия",
+        "image_filename": "tour5.jpg"
+    }
+]
+
+BOOKING_STATUSES = [
+    {"status_name": "В обработке"},
+    {"status_name": "Успешно"},
+    {"status_name": "Отказано"},
+    {"status_name": "Ожидает оплаты"},
+]
+
+PAYMENT_STATUSES = [
+    {'status_payment': 'Оплачено'},
+    {'status_payment': 'Отмена'},
+    {'status_payment': 'Ожидается'},
+]
+
+PAYMENT_METHODS = [
+    {'method_name': 'Банковская карта'},
+    {'method_name': 'Наличные'},
+]
+
+DESTINATIONS = [
+    {
+        "name": "Сочи",
+        "country": "Россия",
+        "description": "Прекрасный отдых на черноморском побережье"
+    },
+    {
+        "name": "Горно-Алтайск",
+        "country": "Россия",
+        "description": "Приключения в горах Алтая"
+    },
+    {
+        "name": "Анталия",
+        "country": "Турция",
+        "description": "Все включено на берегу Средиземного моря"
+    },
+    {
+        "name": "Хургада",
+        "country": "Египет",
+        "description": "Погружение в мир коралловых рифов"
+    },
+    {
+        "name": "Рим",
+        "country": "Италия",
+        "description": "Экскурсионный тур по историческим местам"
+    }
+]
+
+"""Связи туров и направлений: (название тура, город, страна)"""
+TOUR_DESTINATIONS = [
+    ("Отдых в Сочи", "Сочи", "Россия"),
+    ("Горный Алтай", "Горно-Алтайск", "Россия"),
+    ("Турция, Анталия", "Анталия", "Турция"),
+    ("Египет, Хургада", "Хургада", "Египет"),
+    ("Италия, Рим", "Рим", "Италия"),
+]
+
+SEED_BATCH_SIZE = 1000   # Строк в одном INSERT при массовой загрузке
+
+
+def insert_missing(model, key_fields: list, rows: list) -> int:
+    """Добавляет строки, которых еще нет в таблице по естественному ключу key_fields.
+    Существующие ключи читаются одним запросом, недостающие строки вставляются пачками"""
+    names = [field.name for field in key_fields]
+    existing = set(model.select(*key_fields).tuples())
+    missing, seen = [], set()
+    for row in rows:
+        key = tuple(row[name] for name in names)
+        if key not in existing and key not in seen:
+            seen.add(key)
+            missing.append(row)
+    for batch in chunked(missing, SEED_BATCH_SIZE):
+        model.insert_many(batch).execute()
+    return len(missing)
+
+def create_roles() -> int:
     """Создание базовых ролей"""
-    try:
-        if Roles.select().count() > 1:
-            print('Роли уже созданы.')
-            return
-        roles = [
-            {
-                'name': 'Пользователь'
-            },
-            {
-                'name': 'Администратор'
-            }
-        ]
-        
-        for r in roles:
-            Roles.create(**r)
-        print('Роли успешно созданы.')
-    except Exception as e:
-        print(f'Ошибка при создании ролей: {e}')
-    
-def create_admin():
+    return insert_missing(Roles, [Roles.name], ROLES)
+
+def create_admin() -> int:
     """Создание администратора"""
-    try:
-        admin_email=ADMIN_EMAIL
-        if not Users.select().where(Users.email==admin_email).exists():
-            Users.create(
-                email=ADMIN_EMAIL,
-                password=hashlib.sha512(ADMIN_PASSWORD.encode('utf-8')).hexdigest(),
-                full_name='Администратор',
-                number_phone=ADMIN_PHONE,
-                role=2
-                )
-            print('Администратор успешно создан.')
-        else:
-            print('Администратор уже существует.')
-            
-    except Exception as e:
-        print(f'Ошибка, не удалось создать администратора: {e}')
+    if not ADMIN_EMAIL or not ADMIN_PASSWORD:
+        print('ADMIN_EMAIL и ADMIN_PASSWORD не заданы, администратор не создан.')
+        return 0
+    if Users.select().where(Users.email == ADMIN_EMAIL).exists():
+        return 0
+    admin_role = Roles.select(Roles.id).where(Roles.name == 'Администратор').scalar()
+    return insert_missing(Users, [Users.email], [{
+        'email': ADMIN_EMAIL,
+        'password': hash_password(ADMIN_PASSWORD),
+        'full_name': 'Администратор',
+        'number_phone': ADMIN_PHONE,
+        'role': admin_role
+    }])
 
-def create_tours():
+def create_tours() -> int:
     """Создание тестовых туров"""
-    try:
-        if Tours.select().count() > 4:
-            print('Тестовые туры уже созданы.')
-            return
-        
-        tours = [
-            {
-                "name": "Отдых в Сочи",
-                "description": "Прекрасный отдых на черноморском побережье",
-                "price": 25000,
-                "days": 7,
-                "country": "Россия",
-                "image_filename": "tour1.jpg"
-            },
-            {
-                "name": "Горный Алтай",
-                "description": "Приключения в горах Алтая",
-                "price": 18000,
-                "days": 5,
-                "country": "Россия",
-                "image_filename": "tour2.jpg"
-            },
-            {
-                "name": "Турция, Анталия",
-                "description": "Все включено на берегу Средиземного моря",
-                "price": 35000,
-                "days": 10,
-                "country": "Турция",
-                "image_filename": "tour3.jpg"
-            },
-            {
-                "name": "Египет, Хургада",
-                "description": "Погружение в мир коралловых рифов",
-                "price": 40000,
-                "days": 8,
-                "country": "Египет",
-                "image_filename": "tour4.jpg"
-            },
-            {
-                "name": "Италия, Рим",
-                "description": "Экскурсионный тур по историческим местам",
-                "price": 55000,
-                "days": 6,
-                "country": "Италия",
-                "image_filename": "tour5.jpg"
-            }
-        ]
-        
-        for tour_data in tours:
-            Tours.create(**tour_data) 
-        print('Туры успешно созданы.')
-    except Exception as e:
-        print(f'Ошибка при создании туров: {e}')
-        
-def create_status():
+    return insert_missing(Tours, [Tours.name], TOURS)
+
+def create_status() -> int:
     """Создание статусов бронирования"""
-    try:
-        if StatusBooking.select().count() > 2:
-            print('Тестовые записи статус созданы.')
-            return
-        status_booking = [
-            {
-                "status_name": "В обработке"
-            },
-            {
-                "status_name": "Успешно"
-            },
-            {
-                "status_name": "Отказано"
-            },
-            {
-                "status_name": "Ожидает оплаты"
-            }
-        ]
-        for status in status_booking:
-            StatusBooking.create(**status)
-    except Exception as e:
-        print(f'Ошибка при создании статусов заявок: {e}')
+    return insert_missing(StatusBooking, [StatusBooking.status_name], BOOKING_STATUSES)
 
-def create_payment_status():
+def create_payment_status() -> int:
     """Создание статусов оплаты"""
-    try:
-        if PaymentStatus.select().count() > 2:
-            print('Статус оплаты уже созданы.')
-            return
-        
-        status = [
-            {
-                'status_payment': 'Оплачено'
-            },
-            {
-                'status_payment': 'Отмена'
-            },
-            {
-                'status_payment': 'Ожидается'
-            }
-        ]
-        
-        for st in status:
-            PaymentStatus.create(**st)
-    except Exception as e:
-        print(f'Ошибка при создании статусов оплаты: {e}')
+    return insert_missing(PaymentStatus, [PaymentStatus.status_payment], PAYMENT_STATUSES)
 
-def create_payment_method():
+def create_payment_method() -> int:
     """Создание способов оплаты"""
-    try:
-        if PaymentsMethods.select().count() > 1:
-            print('Способы оплаты уже созданы.')
-            return
-        
-        methods = [
-            {
-                'method_name': 'Банковская карта'
-            },
-            {
-                'method_name': 'Наличные'
-            }
-        ]
-        for method in methods:
-            PaymentsMethods.create(**method)
-        print('Способы оплаты успешно созданы.')
-    except Exception as e:
-        print(f'Ошибка при создании способов оплаты: {e}')
-        
-def create_destinations():
+    return insert_missing(PaymentsMethods, [PaymentsMethods.method_name], PAYMENT_METHODS)
+
+def create_destinations() -> int:
     """Создание направлений"""
-    try:
-        if Destinations.select().count() > 3:
-            print('Тестовые направления уже созданы.')
-            return
-        
-        destinations = [
-            {
-                "name": "Сочи",
-                "country": "Россия",
-                "description": "Прекрасный отдых на черноморском побережье"
-            },
-            {
-                "name": "Горно-Алтайск",
-                "country": "Россия",
-                "description": "Приключения в горах Алтая"
-            },
-            {
-                "name": "Анталия",
-                "country": "Турция",
-                "description": "Все включено на берегу Средиземного моря"
-            },
-            {
-                "name": "Хургада",
-                "country": "Египет",
-                "description": "Погружение в мир коралловых рифов"
-            },
-            {
-                "name": "Рим",
-                "country": "Италия",
-                "description": "Экскурсионный тур по историческим местам"
-            }
-        ]
-        
-        for dest_data in destinations:
-            Destinations.create(**dest_data)
-            
-        print('Направления успешно созданы.')
-    except Exception as e:
-        print(f'Ошибка при создании направлений: {e}')
-        
-def create_tour_destinations():
+    return insert_missing(Destinations, [Destinations.name, Destinations.country], DESTINATIONS)
+
+def create_tour_destinations() -> int:
     """Создание связей туров и направлений"""
+    tours = dict(Tours.select(Tours.name, Tours.id).tuples())
+    destinations = {(name, country): dest_id for dest_id, name, country
+                    in Destinations.select(Destinations.id, Destinations.name, Destinations.country).tuples()}
+    links = [{'tour_id': tours[tour], 'destinations_id': destinations[(city, country)]}
+             for tour, city, country in TOUR_DESTINATIONS
+             if tour in tours and (city, country) in destinations]
+    return insert_missing(TourDestinations, [TourDestinations.tour_id, TourDestinations.destinations_id], links)
+
+
+def seed_database():
+    """Заполнение справочников и демонстрационных данных в одной транзакции.
+    Повторный запуск добавляет только недостающие строки"""
+    seeds = [
+        ('Роли', create_roles),
+        ('Администратор', create_admin),
+        ('Туры', create_tours),
+        ('Статусы бронирования', create_status),
+        ('Статусы оплаты', create_payment_status),
+        ('Способы оплаты', create_payment_method),
+        ('Направления', create_destinations),
+        ('Связи туров с направлениями', create_tour_destinations),
+    ]
     try:
-        if TourDestinations.select().count() > 3:
-            print('Связи туров с направлениями уже созданы.')
-            return
-
-        links = [
-            {"tour_id": 1, "destinations_id": 1},
-            {"tour_id": 2, "destinations_id": 2},
-            {"tour_id": 3, "destinations_id": 3},
-            {"tour_id": 4, "destinations_id": 4},
-            {"tour_id": 5, "destinations_id": 5}
-        ]
-        
-        for link in links:
-            TourDestinations.create(**link)
-            
-        print('Связи туров с направлениями успешно созданы.')
+        with db_connection.atomic():
+            for title, seed in seeds:
+                print(f'{title}: добавлено {seed()}')
     except Exception as e:
-        print(f'Ошибка при создании связей: {e}')
-    
-        
-try:
-    db_connection.connect()
-    initialize_tables()
-    create_roles()
-    create_admin()
-    create_tours()
-    create_status()
-    create_payment_status()
-    create_payment_method()
-    create_destinations()
-    create_tour_destinations()
-except Exception as e:
-    print(f'Error initializing tables: {e}')
-finally:
-    db_connection.close()
\ No newline at end of file
+        print(f'Ошибка при заполнении БД, изменения отменены: {e}')
+        raise
+
+def seed_synthetic(users: int, bookings: int, paid_ratio: float = 0.8, random_seed: int = 0) -> None:
+    """Массовая загрузка синтетических пользователей, бронирований и платежей для нагрузочных тестов.
+    Требует заполненных справочников (seed_database); повторный запуск добавляет новые строки"""
+    rnd = random.Random(random_seed)
+    with db_connection.atomic():
+        role = Roles.select(Roles.id).where(Roles.name == 'Пользователь').scalar()
+        tours = list(Tours.select(Tours.id, Tours.price).tuples())
+        statuses = [status_id for status_id, in StatusBooking.select(StatusBooking.id).tuples()]
+        methods = [method_id for method_id, in PaymentsMethods.select(PaymentsMethods.id).tuples()]
+        payment_statuses = [status_id for status_id, in PaymentStatus.select(PaymentStatus.id).tuples()]
+        if not (role and tours and statuses and methods and payment_statuses):
+            raise RuntimeError('Справочники не заполнены, сначала выполните python manage.py seed.')
+
+        offset = Users.select().where(Users.email.startswith('synthetic')).count()
+        password = hash_password('synthetic')
+        for batch in chunked(range(offset, offset + users), SEED_BATCH_SIZE):
+            Users.insert_many([{
+                'email': f'synthetic{n}@example.com',
+                'password': password,
+                'full_name': f'Тестовый пользователь {n}',
+                'number_phone': f'+70{n:010d}',
+                'role': role
+            } for n in batch]).execute()
+        user_rows = list(Users
+                         .select(Users.id, Users.email)
+                         .where(Users.email.startswith('synthetic'))
+                         .tuples())
+        if not user_rows:
+            raise RuntimeError('Нет синтетических пользователей для бронирований.')
+        print(f'Пользователи: добавлено {users}')
+
+        offset = Bookings.select().where(Bookings.booking_number.startswith('S')).count()
+        now = datetime.datetime.now()
+        prices = dict(tours)
+        paid = 0
+        for batch in chunked(range(offset, offset + bookings), SEED_BATCH_SIZE):
+            rows = []
+            for n in batch:
+                user_id, email = rnd.choice(user_rows)
+                tour_id, price = rnd.choice(tours)
+                rows.append({
+                    'user_id': user_id,
+                    'email': email,
+                    'birthday': datetime.date(rnd.randint(1950, 2000), rnd.randint(1, 12), rnd.randint(1, 28)),
+                    'tour_id': tour_id,
+                    'booking_date': now - datetime.timedelta(minutes=rnd.randint(0, 525600)),
+                    'status': rnd.choice(statuses),
+                    'number_of_people': rnd.randint(1, 5),
+                    'booking_number': f'S{n:09d}'
+                })
+            Bookings.insert_many(rows).execute()
+
+            inserted = (Bookings
+                        .select(Bookings.booking_id, Bookings.tour_id, Bookings.number_of_people, Bookings.booking_date)
+                        .where(Bookings.booking_number.in_([row['booking_number'] for row in rows]))
+                        .tuples())
+            payments = [{
+                'booking_id': booking_id,
+                'payment_date': booking_date + datetime.timedelta(hours=rnd.randint(1, 72)),
+                'amount': prices[tour_id] * number_of_people,
+                'method': rnd.choice(methods),
+                'payment_status': rnd.choice(payment_statuses)
+            } for booking_id, tour_id, number_of_people, booking_date in inserted if rnd.random() < paid_ratio]
+            if payments:
+                Payments.insert_many(payments).execute()
+            paid += len(payments)
+        print(f'Бронирования: добавлено {bookings}, платежи: добавлено {paid}')
@@ -0,0 +1,110 @@
+"""Курсорная (keyset) пагинация списков
+
+Страница - это WHERE ключ > ключ последней строки предыдущей страницы ORDER BY ключ LIMIT n,
+поэтому стоимость любой страницы одинакова и не зависит от размера таблицы (в отличие от OFFSET).
+Поля ключа должны идти первыми в выборке; курсор следующей страницы возвращается
+в заголовке X-Next-Cursor (нет заголовка - страница последняя), тело ответа остается списком.
+"""
+from typing import NamedTuple, Optional
+from fastapi import HTTPException, Query, Response
+from peewee import Tuple
+from dotenv import load_dotenv
+import base64
+import json
+import os
+import sys
+
+load_dotenv()
+
+DEFAULT_PAGE_SIZE = int(os.getenv('PAGE_SIZE_DEFAULT', 100))
+MAX_PAGE_SIZE = int(os.getenv('PAGE_SIZE_MAX', 1000))
+STREAM_BATCH_SIZE = 1000   # Строк за один запрос при потоковой выдаче больших страниц
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+class Page(NamedTuple):
+    """Запрошенная страница: размер и ключ последней строки предыдущей страницы"""
+    limit: int
+    after: Optional[tuple] = None
+
+
+def encode_cursor(key: tuple) -> str:
+    """Непрозрачный курсор из значений ключа"""
+    raw = json.dumps(list(key), default=str, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> tuple:
+    """Значения ключа из курсора; ValueError, если курсор поврежден"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError('Некорректный курсор.')
+    if not isinstance(key, list) or not key:
+        raise ValueError('Некорректный курсор.')
+    if not all(isinstance(value, (int, float, str)) and not isinstance(value, bool) for value in key):
+        raise ValueError('Некорректный курсор.')   # Значения ключа - только скаляры
+    return tuple(key)
+
+def make_page(limit: int, cursor: Optional[str]) -> Page:
+    """Страница по параметрам запроса; 400, если курсор поврежден"""
+    try:
+        return Page(limit, decode_cursor(cursor) if cursor else None)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+def page_params(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description='Размер страницы'),
+    cursor: Optional[str] = Query(None, description='Курсор из заголовка X-Next-Cursor предыдущей страницы')
+) -> Page:
+    """Зависимость: параметры limit и cursor"""
+    return make_page(limit, cursor)
+
+def page_query(query, key_fields: list, page: Page, extra: int = 1):
+    """Ограничивает запрос страницей; выбирается на extra строк больше, чтобы узнать, есть ли продолжение"""
+    if page.after is not None:
+        if len(page.after) != len(key_fields):
+            raise HTTPException(400, 'Некорректный курсор.')
+        if len(key_fields) == 1:
+            query = query.where(key_fields[0] > page.after[0])
+        else:
+            query = query.where(Tuple(*key_fields) > Tuple(*page.after))
+    return query.order_by(*key_fields).limit(page.limit + extra)
+
+def split_page(rows: list, key_fields: list, page: Page) -> tuple[list, Optional[str]]:
+    """Строки страницы и курсор следующей (None, если страница последняя)"""
+    if len(rows) <= page.limit:
+        return rows, None
+    rows = rows[:page.limit]
+    return rows, encode_cursor(rows[-1][:len(key_fields)])
+
+def paginate(query, key_fields: list, page: Page) -> tuple[list, Optional[str]]:
+    """Строки страницы (кортежи) и курсор следующей"""
+    return split_page(list(page_query(query, key_fields, page)), key_fields, page)
+
+def iterate_page(query, key_fields: list, page: Page, batch_size: int = STREAM_BATCH_SIZE):
+    """Строки страницы пачками по batch_size, каждая пачка - отдельный keyset-запрос;
+    большая страница не читается из БД целиком"""
+    remaining, after = page.limit, page.after
+    while remaining > 0:
+        size = min(batch_size, remaining)
+        rows = list(page_query(query, key_fields, Page(size, after), extra=0))
+        yield from rows
+        if len(rows) < size:
+            return
+        after = rows[-1][:len(key_fields)]
+        remaining -= size
+
+def iterate_all(query, key_fields: list, batch_size: int = STREAM_BATCH_SIZE):
+    """Все строки запроса пачками keyset-запросов (выгрузки); в памяти не больше одной пачки"""
+    return iterate_page(query, key_fields, Page(sys.maxsize), batch_size)
+
+def next_page_cursor(query, key_fields: list, page: Page) -> Optional[str]:
+    """Курсор следующей страницы без чтения самой страницы (для потоковой выдачи):
+    ключ последней строки страницы, если за ней есть еще строки"""
+    keys = list(page_query(query.select(*key_fields), key_fields, page).offset(page.limit - 1).limit(2))
+    return encode_cursor(keys[0]) if len(keys) == 2 else None
+
+def set_next_cursor(response: Response, cursor: Optional[str]) -> None:
+    """Передает курсор следующей страницы в заголовке ответа"""
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
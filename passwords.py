@@ -0,0 +1,107 @@
+"""Хеширование паролей (PBKDF2) в ограниченном пуле потоков"""
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PBKDF2_ALGORITHM = 'pbkdf2_sha256'
+DEFAULT_ITERATIONS = int(os.getenv('PASSWORD_KDF_ITERATIONS', 600000))
+
+
+class PasswordHasherBusy(Exception):
+    """Очередь на хеширование переполнена"""
+
+
+def _legacy_hash(password: str) -> str:
+    return hashlib.sha512(password.encode('utf-8')).hexdigest()
+
+def hash_password(password: str, iterations: int = DEFAULT_ITERATIONS) -> str:
+    """Хеширует пароль: 'pbkdf2_sha256$<итерации>$<соль>$<хеш>'"""
+    salt = secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+    salt_b64 = base64.b64encode(salt).decode('ascii').rstrip('=')
+    digest_b64 = base64.b64encode(digest).decode('ascii').rstrip('=')
+    return f'{PBKDF2_ALGORITHM}${iterations}${salt_b64}${digest_b64}'
+
+def verify_password(password: str, stored: str) -> bool:
+    """Проверяет пароль по PBKDF2-хешу или по старому хешу SHA-512"""
+    if not stored.startswith(PBKDF2_ALGORITHM + '$'):
+        return hmac.compare_digest(_legacy_hash(password), stored)
+    try:
+        _, iterations, salt_b64, digest_b64 = stored.split('$')
+        salt = base64.b64decode(salt_b64 + '=' * (-len(salt_b64) % 4))
+        expected = base64.b64decode(digest_b64 + '=' * (-len(digest_b64) % 4))
+    except ValueError:
+        return False
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, int(iterations))
+    return hmac.compare_digest(digest, expected)
+
+def needs_rehash(stored: str, iterations: int = DEFAULT_ITERATIONS) -> bool:
+    """Нужно ли пересчитать хеш: старый SHA-512 или другая стоимость PBKDF2"""
+    if not stored.startswith(PBKDF2_ALGORITHM + '$'):
+        return True
+    return stored.split('$')[1] != str(iterations)
+
+
+class PasswordHasher:
+    """Выполняет хеширование в пуле потоков, не блокируя цикл событий.
+
+    Одновременно считается не более max_workers хешей, еще max_queue запросов
+    ждут в очереди; остальные сразу получают PasswordHasherBusy.
+    """
+
+    def __init__(self, iterations: int = DEFAULT_ITERATIONS, max_workers: int = None, max_queue: int = 64):
+        self.iterations = iterations
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='password-hasher')
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._max_in_flight = 0
+
+    async def hash(self, password: str) -> str:
+        """Хеширует пароль с текущей стоимостью"""
+        return await self._run(hash_password, password, self.iterations)
+
+    async def verify(self, password: str, stored: str) -> bool:
+        """Проверяет пароль"""
+        return await self._run(verify_password, password, stored)
+
+    def needs_rehash(self, stored: str) -> bool:
+        """Нужно ли обновить хеш после успешного входа"""
+        return needs_rehash(stored, self.iterations)
+
+    async def _run(self, func, *args):
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise PasswordHasherBusy()
+            self._in_flight += 1
+            self._max_in_flight = max(self._max_in_flight, self._in_flight)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._completed += 1
+
+    def stats(self) -> dict:
+        """Метрики пула: выполняется, в очереди, максимум, выполнено, отклонено"""
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'in_flight': self._in_flight,
+                'queued': max(0, self._in_flight - self.max_workers),
+                'max_in_flight': self._max_in_flight,
+                'completed': self._completed,
+                'rejected': self._rejected,
+            }
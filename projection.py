@@ -0,0 +1,50 @@
+"""Выборочные поля ответа (параметр fields=): сужает и SELECT, и JSON
+
+Для каждого ресурса задается белый список полей: имя в параметре fields -> ключ в ответе,
+столбец выборки и необязательное преобразование значения. Без fields возвращаются все поля.
+"""
+from typing import Callable, NamedTuple, Optional
+from fastapi import HTTPException, Query
+
+
+class FieldSpec(NamedTuple):
+    """Поле ресурса: ключ в ответе, столбец выборки, преобразование значения"""
+    label: str
+    column: object
+    convert: Optional[Callable] = None
+
+
+def fields_param(fields: Optional[str] = Query(None, description='Поля ответа через запятую, например fields=id,name')):
+    """Зависимость: значение параметра fields"""
+    return fields
+
+
+class Projection:
+    """Белый список полей ресурса; key - столбцы, которые выбираются всегда (ключ пагинации)"""
+
+    def __init__(self, fields: dict, key: list = None):
+        self.fields = fields
+        self.key = key or []
+
+    def parse(self, fields: Optional[str]) -> list:
+        """Запрошенные поля в порядке белого списка; 400 для неизвестных полей"""
+        if not fields:
+            return list(self.fields)
+        requested = {name.strip() for name in fields.split(',') if name.strip()}
+        unknown = requested - self.fields.keys()
+        if unknown or not requested:
+            raise HTTPException(400, f'Неизвестные поля: {", ".join(sorted(unknown)) or "-"}. '
+                                     f'Доступны: {", ".join(self.fields)}.')
+        return [name for name in self.fields if name in requested]
+
+    def columns(self, names: list) -> list:
+        """Столбцы выборки: ключ, затем запрошенные поля"""
+        return self.key + [self.fields[name].column for name in names]
+
+    def to_dict(self, names: list, row: tuple) -> dict:
+        """Строка выборки (ключ + запрошенные поля) в словарь ответа"""
+        result = {}
+        for name, value in zip(names, row[len(self.key):]):
+            field = self.fields[name]
+            result[field.label] = field.convert(value) if field.convert and value is not None else value
+        return result
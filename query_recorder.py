@@ -0,0 +1,184 @@
+"""Учет SQL-запросов по HTTP-запросам: число, время в БД, повторяющиеся запросы (N+1)
+
+Каждый запрос к БД (peewee и асинхронные драйверы) вызывает record_query. Внутри HTTP-запроса
+статистика копится в RequestQueries текущего контекста, по завершении попадает в метрики
+по маршрутам, а в режиме отладки - в заголовки ответа X-DB-Queries, X-DB-Time, X-DB-Repeated.
+Обработчику можно объявить бюджет запросов декоратором query_budget.
+"""
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+import re
+import threading
+
+_IN_LIST = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+_NUMBER = re.compile(r'\b\d+\b')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Обработчик выполнил больше запросов к БД, чем объявлено в query_budget"""
+
+
+def query_shape(sql: str) -> str:
+    """Форма запроса: списки IN (%s, %s, ...) и числа в тексте заменены заглушками"""
+    return _NUMBER.sub('N', _IN_LIST.sub('(...)', sql))
+
+def query_budget(max_queries: int):
+    """Декоратор обработчика: не больше max_queries запросов к БД за HTTP-запрос (включая проверку токена)"""
+    def decorator(func):
+        func.query_budget = max_queries
+        return func
+    return decorator
+
+
+class RequestQueries:
+    """Запросы к БД одного HTTP-запроса"""
+
+    def __init__(self, scope: dict = None, strict: bool = False):
+        self.scope = scope if scope is not None else {}
+        self.strict = strict
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+        self.budget_exceeded = False
+
+    def record(self, sql: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        self.shapes[query_shape(sql)] += 1
+        budget = self.budget
+        if budget is not None and self.count > budget and not self.budget_exceeded:
+            self.budget_exceeded = True
+            if self.strict:
+                raise QueryBudgetExceeded(f'Превышен бюджет запросов к БД: {self.count} > {budget} ({self.route})')
+
+    @property
+    def budget(self):
+        return getattr(self.scope.get('endpoint'), 'query_budget', None)
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get('route')
+        return getattr(route, 'path', None) or self.scope.get('path', '')
+
+    def most_repeated(self) -> tuple:
+        """Самый частый запрос и число его повторов"""
+        if not self.shapes:
+            return '', 0
+        return self.shapes.most_common(1)[0]
+
+
+class QueryMetrics:
+    """Накопленная статистика запросов к БД по маршрутам"""
+
+    def __init__(self, repeat_threshold: int = 10):
+        self.repeat_threshold = repeat_threshold
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def add(self, queries: RequestQueries) -> bool:
+        """Учитывает завершенный HTTP-запрос; возвращает True, если похоже на N+1"""
+        suspicious = queries.most_repeated()[1] >= self.repeat_threshold
+        with self._lock:
+            route = self._routes.setdefault(queries.route, {
+                'requests': 0, 'queries': 0, 'max_queries': 0, 'db_time_ms': 0.0,
+                'n_plus_one': 0, 'budget_exceeded': 0,
+            })
+            route['requests'] += 1
+            route['queries'] += queries.count
+            route['max_queries'] = max(route['max_queries'], queries.count)
+            route['db_time_ms'] += queries.seconds * 1000
+            route['n_plus_one'] += suspicious
+            route['budget_exceeded'] += queries.budget_exceeded
+        return suspicious
+
+    def stats(self) -> dict:
+        """Метрики по маршрутам: запросов, SQL всего и максимум, время в БД, подозрений на N+1"""
+        with self._lock:
+            return {path: {**route,
+                           'avg_queries': round(route['queries'] / route['requests'], 2),
+                           'db_time_ms': round(route['db_time_ms'], 1)}
+                    for path, route in sorted(self._routes.items())}
+
+
+_current = ContextVar('request_queries', default=None)
+_listeners = []
+_listeners_lock = threading.Lock()
+
+def record_query(sql: str, seconds: float) -> None:
+    """Вызывается после каждого запроса к БД"""
+    queries = _current.get()
+    if _listeners:
+        with _listeners_lock:
+            for listener in _listeners:
+                listener.record(sql, seconds)
+    if queries is not None:
+        queries.record(sql, seconds)
+
+@contextmanager
+def capture_queries():
+    """Все запросы к БД процесса (из любых потоков) внутри блока, например в тестах:
+
+        with capture_queries() as captured:
+            client.get('/payments/get_all_payments/', headers=headers)
+        assert captured.count <= 2
+    """
+    captured = RequestQueries()
+    with _listeners_lock:
+        _listeners.append(captured)
+    try:
+        yield captured
+    finally:
+        with _listeners_lock:
+            _listeners.remove(captured)
+
+@contextmanager
+def assert_max_queries(max_queries: int):
+    """Проверка для тестов: внутри блока выполнено не больше max_queries запросов к БД"""
+    with capture_queries() as captured:
+        yield captured
+    if captured.count > max_queries:
+        shape, repeats = captured.most_repeated()
+        raise QueryBudgetExceeded(f'Выполнено {captured.count} запросов к БД вместо {max_queries}, '
+                                  f'чаще всего ({repeats} раз): {shape}')
+
+
+class QueryRecorderMiddleware:
+    """ASGI-middleware: собирает запросы к БД каждого HTTP-запроса в metrics,
+    в режиме debug добавляет их число и время в заголовки ответа"""
+
+    def __init__(self, app, metrics: QueryMetrics, debug: bool = False, strict: bool = False):
+        self.app = app
+        self.metrics = metrics
+        self.debug = debug
+        self.strict = strict
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        queries = RequestQueries(scope, self.strict)
+        token = _current.set(queries)
+
+        async def send_with_headers(message):
+            if message['type'] == 'http.response.start':
+                _, repeats = queries.most_repeated()
+                headers = list(message.get('headers', []))
+                headers += [
+                    (b'x-db-queries', str(queries.count).encode()),
+                    (b'x-db-time', f'{queries.seconds * 1000:.1f}'.encode()),
+                    (b'x-db-repeated', str(repeats).encode()),
+                    (b'server-timing', f'db;dur={queries.seconds * 1000:.1f}'.encode()),
+                ]
+                message = {**message, 'headers': headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers if self.debug else send)
+        finally:
+            _current.reset(token)
+            if self.metrics.add(queries) and self.debug:
+                shape, repeats = queries.most_repeated()
+                print(f'Возможный N+1 в {queries.route}: {repeats} одинаковых запросов: {shape}')
+            if queries.budget_exceeded:
+                print(f'Превышен бюджет запросов к БД в {queries.route}: {queries.count} > {queries.budget}')
@@ -0,0 +1,95 @@
+"""Справочники в памяти процесса: статусы бронирования и оплаты, способы оплаты, роли
+
+Маленькие, почти не меняющиеся таблицы загружаются целиком при запуске, и поиск
+id по названию не обращается к БД. Эндпоинты, изменяющие справочник, вызывают invalidate -
+следующий поиск перечитывает таблицу. Названия, которых нет в памяти, перечитываются из БД сразу
+(их могли добавить другие процессы - несколько воркеров, manage.py); прочие изменения
+подхватываются не позже чем через ttl секунд.
+"""
+from datetime import datetime, timedelta
+from typing import Optional
+import threading
+from database import db_connection
+from models import Roles, StatusBooking, PaymentStatus, PaymentsMethods
+
+
+class ReferenceTable:
+    """Справочник: таблица с полями id и названием"""
+
+    def __init__(self, model, name_field, ttl: int = 300):
+        self.model = model
+        self.name_field = name_field
+        self.ttl = timedelta(seconds=ttl)
+        self._entry = None   # (название -> id, действителен до)
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def query(self):
+        return self.model.select(self.model.id, self.name_field).order_by(self.model.id).tuples()
+
+    def _store(self, rows, generation: int) -> tuple:
+        ids = {}
+        for row_id, name in rows:
+            ids.setdefault(name, row_id)   # Названия статусов не уникальны - берется первый по id
+        entry = (ids, datetime.now() + self.ttl)
+        with self._lock:
+            if generation == self._generation:   # Иначе справочник изменился во время чтения
+                self._entry = entry
+        return entry
+
+    def _cached(self) -> Optional[tuple]:
+        entry = self._entry
+        if entry is not None and datetime.now() < entry[1]:
+            return entry
+        return None
+
+    def load(self) -> tuple:
+        """Читает таблицу из БД (peewee, текущий поток)"""
+        generation = self._generation
+        return self._store(list(self.query()), generation)
+
+    async def load_async(self, driver) -> tuple:
+        """Читает таблицу через асинхронный драйвер БД"""
+        generation = self._generation
+        return self._store(await driver.fetch_all(self.query()), generation)
+
+    def invalidate(self) -> None:
+        """Таблица изменена: при следующем поиске она будет перечитана"""
+        with self._lock:
+            self._generation += 1
+            self._entry = None
+
+    def id_of(self, name: str) -> Optional[int]:
+        """id по названию; None, если такого нет и в БД"""
+        entry = self._cached()
+        if entry is None or name not in entry[0]:   # Название могли добавить в другом процессе
+            entry = self.load()
+        return entry[0].get(name)
+
+    async def id_of_async(self, name: str, driver) -> Optional[int]:
+        """id по названию для асинхронных обработчиков; None, если такого нет и в БД"""
+        entry = self._cached()
+        if entry is None or name not in entry[0]:   # Название могли добавить в другом процессе
+            entry = await self.load_async(driver)
+        return entry[0].get(name)
+
+
+class ReferenceData:
+    """Все справочники приложения"""
+
+    def __init__(self, ttl: int = 300):
+        self.roles = ReferenceTable(Roles, Roles.name, ttl)
+        self.booking_statuses = ReferenceTable(StatusBooking, StatusBooking.status_name, ttl)
+        self.payment_statuses = ReferenceTable(PaymentStatus, PaymentStatus.status_payment, ttl)
+        self.payment_methods = ReferenceTable(PaymentsMethods, PaymentsMethods.method_name, ttl)
+
+    @property
+    def tables(self) -> list:
+        return [self.roles, self.booking_statuses, self.payment_statuses, self.payment_methods]
+
+    def load(self) -> None:
+        """Загружает все справочники (при запуске приложения, вне HTTP-запроса):
+        одно соединение из пула на все таблицы, после загрузки оно возвращается в пул"""
+        with db_connection.connection_context():
+            for table in self.tables:
+                table.load()
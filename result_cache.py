@@ -0,0 +1,60 @@
+"""Ограниченный LRU-кэш результатов с версией и TTL
+
+invalidate увеличивает версию и очищает кэш; результат, вычисленный по данным старой версии
+(начатый до invalidate), не сохраняется. Изменения из других процессов подхватываются через ttl секунд.
+"""
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import threading
+
+
+class ResultCache:
+    """LRU-кэш ключ -> результат с версией, TTL и счетчиками попаданий"""
+
+    def __init__(self, maxsize: int = 1024, ttl: int = 60):
+        self.maxsize = maxsize
+        self.ttl = timedelta(seconds=ttl)
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        """Данные изменены: все сохраненные результаты устарели"""
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+    def get(self, key):
+        """Результат текущей версии или None"""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None or item[0] != self.version or datetime.now() > item[1]:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[2]
+
+    def set(self, key, version: int, value):
+        """Сохраняет результат, вычисленный по данным версии version; устаревший не сохраняется"""
+        with self._lock:
+            if version == self.version:
+                self._entries[key] = (version, datetime.now() + self.ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return value
+
+    def stats(self) -> dict:
+        """Версия, число записей, попадания и промахи"""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'version': self.version,
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / requests, 3) if requests else 0.0,
+            }
@@ -0,0 +1,172 @@
+"""Хранилище пользовательских сессий (несколько устройств на пользователя)"""
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+from peewee import Case
+from starlette.concurrency import run_in_threadpool
+import hashlib
+import threading
+import uuid
+from background import PeriodicTask
+from models import Sessions
+
+
+class Session(NamedTuple):
+    """Сессия пользователя на одном устройстве"""
+    token_hash: str
+    user_id: int
+    role: str
+    device: Optional[str]
+    created_at: datetime
+    expires_at: datetime
+
+
+def hash_token(token: str) -> str:
+    """В хранилище попадает только SHA-256 от токена"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+class MemorySessionBackend:
+    """Сессии в памяти процесса (один воркер, отладка)"""
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def add(self, session: Session) -> None:
+        with self._lock:
+            self._sessions[session.token_hash] = session
+
+    def get(self, token_hash: str) -> Optional[Session]:
+        return self._sessions.get(token_hash)
+
+    async def get_async(self, token_hash: str, driver) -> Optional[Session]:
+        return self._sessions.get(token_hash)
+
+    def delete(self, token_hash: str) -> int:
+        with self._lock:
+            return 1 if self._sessions.pop(token_hash, None) else 0
+
+    def delete_user(self, user_id: int) -> int:
+        with self._lock:
+            hashes = [h for h, s in self._sessions.items() if s.user_id == user_id]
+            for token_hash in hashes:
+                del self._sessions[token_hash]
+            return len(hashes)
+
+    def delete_expired(self, now: datetime) -> int:
+        with self._lock:
+            hashes = [h for h, s in self._sessions.items() if s.expires_at < now]
+            for token_hash in hashes:
+                del self._sessions[token_hash]
+            return len(hashes)
+
+    def set_role(self, user_id: int, role: str) -> int:
+        with self._lock:
+            hashes = [h for h, s in self._sessions.items() if s.user_id == user_id]
+            for token_hash in hashes:
+                self._sessions[token_hash] = self._sessions[token_hash]._replace(role=role)
+            return len(hashes)
+
+    def set_expiry(self, pending: dict) -> int:
+        with self._lock:
+            updated = 0
+            for token_hash, expires_at in pending.items():
+                if token_hash in self._sessions:
+                    self._sessions[token_hash] = self._sessions[token_hash]._replace(expires_at=expires_at)
+                    updated += 1
+            return updated
+
+
+class DatabaseSessionBackend:
+    """Сессии в таблице Sessions: основной БД или отдельной (например, SQLite)"""
+
+    def __init__(self, database=None):
+        self.separate_database = database is not None
+        if database is not None:
+            Sessions.bind(database)
+            database.create_tables([Sessions], safe=True)
+
+    def add(self, session: Session) -> None:
+        Sessions.insert(**session._asdict()).execute()
+
+    def get(self, token_hash: str) -> Optional[Session]:
+        row = Sessions.select().where(Sessions.token_hash == token_hash).tuples().first()
+        return Session(*row) if row else None
+
+    async def get_async(self, token_hash: str, driver) -> Optional[Session]:
+        if self.separate_database:
+            return await run_in_threadpool(self.get, token_hash)
+        row = await driver.fetch_one(Sessions.select().where(Sessions.token_hash == token_hash))
+        return Session(*row) if row else None
+
+    def delete(self, token_hash: str) -> int:
+        return Sessions.delete().where(Sessions.token_hash == token_hash).execute()
+
+    def delete_user(self, user_id: int) -> int:
+        return Sessions.delete().where(Sessions.user_id == user_id).execute()
+
+    def delete_expired(self, now: datetime) -> int:
+        return Sessions.delete().where(Sessions.expires_at < now).execute()
+
+    def set_role(self, user_id: int, role: str) -> int:
+        return Sessions.update(role=role).where(Sessions.user_id == user_id).execute()
+
+    def set_expiry(self, pending: dict) -> int:
+        expires = Case(Sessions.token_hash, list(pending.items()))
+        return (Sessions
+                .update(expires_at=expires)
+                .where(Sessions.token_hash.in_(list(pending)))
+                .execute())
+
+
+class SessionStore:
+    """Выдача, проверка и отзыв сессий поверх выбранного хранилища"""
+
+    def __init__(self, backend, lifetime: timedelta, sweep_interval: int = 300):
+        self.backend = backend
+        self.lifetime = lifetime
+        self._sweeper = PeriodicTask('session-sweeper', sweep_interval, self.sweep)
+
+    def create(self, user_id: int, role: str, device: Optional[str] = None) -> tuple[str, datetime]:
+        """Создает сессию; возвращает токен и срок его действия"""
+        token = str(uuid.uuid4())
+        now = datetime.now()
+        expires_at = now + self.lifetime
+        self.backend.add(Session(hash_token(token), user_id, role, device[:255] if device else None, now, expires_at))
+        return token, expires_at
+
+    def get(self, token: str) -> Optional[Session]:
+        """Находит сессию по токену (одна выборка по первичному ключу)"""
+        return self.backend.get(hash_token(token))
+
+    async def get_async(self, token: str, driver) -> Optional[Session]:
+        """То же, что get, но основная БД опрашивается через асинхронный драйвер"""
+        return await self.backend.get_async(hash_token(token), driver)
+
+    def revoke(self, token: str) -> int:
+        """Завершает одну сессию"""
+        return self.backend.delete(hash_token(token))
+
+    def revoke_user(self, user_id: int) -> int:
+        """Завершает все сессии пользователя"""
+        return self.backend.delete_user(user_id)
+
+    def set_role(self, user_id: int, role: str) -> int:
+        """Обновляет роль во всех сессиях пользователя"""
+        return self.backend.set_role(user_id, role)
+
+    def set_expiry(self, pending: dict) -> int:
+        """Сохраняет новые сроки действия: хеш токена -> срок"""
+        return self.backend.set_expiry(pending)
+
+    def sweep(self) -> int:
+        """Удаляет просроченные сессии"""
+        return self.backend.delete_expired(datetime.now())
+
+    def start(self) -> None:
+        """Запускает периодическую очистку просроченных сессий"""
+        self._sweeper.start()
+
+    def stop(self) -> None:
+        """Останавливает очистку"""
+        self._sweeper.stop()
@@ -0,0 +1,138 @@
+"""Подписанные (HMAC) токены доступа, проверяемые без обращения к БД"""
+from datetime import datetime, timedelta
+from typing import Optional
+import base64
+import hashlib
+import hmac
+import secrets
+import threading
+from background import PeriodicTask
+from database import db_connection
+from models import TokenRevocations, RevokedTokens
+from token_cache import CachedToken
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+def _to_millis(moment: datetime) -> int:
+    return int(moment.timestamp() * 1000)
+
+def parse_signing_keys(value: str) -> dict:
+    """Разбирает строку вида 'kid1:secret1,kid2:secret2'; первый ключ - активный"""
+    keys = {}
+    for item in value.split(','):
+        kid, sep, secret = item.strip().partition(':')
+        if kid and sep and secret:
+            keys[kid] = secret.encode('utf-8')
+    return keys
+
+
+class TokenSigner:
+    """Выпуск и проверка токенов '<kid>.<данные>.<подпись>' с поддержкой ротации ключей"""
+
+    def __init__(self, keys: dict, lifetime: timedelta = timedelta(hours=1)):
+        if not keys:
+            raise ValueError('Не заданы ключи подписи токенов.')
+        self.keys = keys
+        self.active_kid = next(iter(keys))
+        self.lifetime = lifetime
+
+    @staticmethod
+    def is_signed(token: str) -> bool:
+        """Проверяет, похож ли токен на подписанный (обычные токены - uuid4)"""
+        return token.count('.') == 2
+
+    def issue(self, user_id: int, role: str) -> tuple[str, datetime]:
+        """Выпускает токен активным ключом; возвращает токен и срок его действия.
+        Случайный идентификатор jti отличает токены, выпущенные в одну миллисекунду"""
+        issued_at = datetime.now()
+        expires_at = issued_at + self.lifetime
+        jti = secrets.token_urlsafe(12)
+        payload = f'{user_id}|{int(expires_at.timestamp())}|{_to_millis(issued_at)}|{jti}|{role}'
+        body = f'{self.active_kid}.{_b64encode(payload.encode("utf-8"))}'
+        return f'{body}.{self._sign(self.active_kid, body)}', expires_at
+
+    def verify(self, token: str) -> Optional[tuple[CachedToken, int, str]]:
+        """Проверяет подпись токена; возвращает данные пользователя, время выпуска в мс и jti"""
+        try:
+            kid, payload, signature = token.split('.')
+            if kid not in self.keys:
+                return None
+            if not hmac.compare_digest(signature, self._sign(kid, f'{kid}.{payload}')):
+                return None
+            user_id, expires, issued, jti, role = _b64decode(payload).decode('utf-8').split('|', 4)
+            user = CachedToken(int(user_id), role, datetime.fromtimestamp(int(expires)))
+            return user, int(issued), jti
+        except (ValueError, TypeError):
+            return None
+
+    def _sign(self, kid: str, body: str) -> str:
+        digest = hmac.new(self.keys[kid], body.encode('ascii'), hashlib.sha256).digest()
+        return _b64encode(digest)
+
+
+class RevocationList:
+    """Компактный список отзыва: для пользователя хранится только момент отзыва всех его токенов,
+    для отдельных отозванных токенов (выход на одном устройстве) - их jti.
+
+    Записи дублируются в таблицы TokenRevocations и RevokedTokens и периодически перечитываются,
+    чтобы отзыв в одном воркере uvicorn доходил до остальных.
+    """
+
+    def __init__(self, max_age: timedelta, refresh_interval: int = 10):
+        self.max_age = max_age
+        self._revoked = {}
+        self._tokens = {}
+        self._lock = threading.Lock()
+        self._task = PeriodicTask('token-revocations', refresh_interval, self.refresh)
+
+    def revoke_user(self, user_id: int) -> None:
+        """Отзывает все токены пользователя, выданные до текущего момента"""
+        now = _to_millis(datetime.now())
+        TokenRevocations.insert(user_id=user_id, revoked_before=now).on_conflict_replace().execute()
+        with self._lock:
+            self._revoked[user_id] = max(now, self._revoked.get(user_id, 0))
+
+    def revoke_token(self, jti: str, expires_at: datetime) -> None:
+        """Отзывает один токен по его jti"""
+        expires = _to_millis(expires_at)
+        RevokedTokens.insert(jti=jti, expires_at=expires).on_conflict_ignore().execute()
+        with self._lock:
+            self._tokens[jti] = expires
+
+    def is_revoked(self, user_id: int, issued_at: int, jti: str) -> bool:
+        """Проверяет, отозван ли токен jti пользователя, выданный в issued_at (мс)"""
+        return issued_at < self._revoked.get(user_id, 0) or jti in self._tokens
+
+    def refresh(self) -> None:
+        """Перечитывает актуальные отзывы из БД и удаляет устаревшие"""
+        threshold = _to_millis(datetime.now() - self.max_age)
+        TokenRevocations.delete().where(TokenRevocations.revoked_before < threshold).execute()
+        revoked = dict(TokenRevocations.select().tuples())
+        now = _to_millis(datetime.now())
+        RevokedTokens.delete().where(RevokedTokens.expires_at < now).execute()
+        tokens = dict(RevokedTokens.select(RevokedTokens.jti, RevokedTokens.expires_at).tuples())
+        with self._lock:
+            for user_id, revoked_before in self._revoked.items():
+                if revoked_before >= threshold and revoked_before > revoked.get(user_id, 0):
+                    revoked[user_id] = revoked_before
+            for jti, expires in self._tokens.items():
+                if expires >= now:
+                    tokens.setdefault(jti, expires)
+            self._revoked = revoked
+            self._tokens = tokens
+
+    def start(self) -> None:
+        """Загружает список отзыва и запускает его периодическое обновление;
+        соединение для первой загрузки возвращается в пул"""
+        with db_connection.connection_context():
+            self.refresh()
+        self._task.start()
+
+    def stop(self) -> None:
+        """Останавливает периодическое обновление"""
+        self._task.stop()
@@ -0,0 +1,65 @@
+"""Объединение одинаковых одновременных запросов (single-flight)
+
+Пока вычисление с ключом (эндпоинт, параметры) выполняется, такие же запросы не запускают
+свое, а ждут его результат (или исключение). Вычисление выполняется отдельной задачей в копии
+контекста запроса, запустившего его (запросы к БД учитываются в его метриках), но со своим
+соединением с БД, поэтому отключение этого клиента (и возврат в пул соединения его запроса)
+не прерывает ожидание остальных.
+"""
+import asyncio
+import contextvars
+import threading
+
+
+class SingleFlight:
+    """Общие вычисления для одинаковых одновременных запросов с метриками по эндпоинтам"""
+
+    def __init__(self, database=None):
+        self.database = database
+        self._flights = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    async def run(self, name: str, params: tuple, func):
+        """Результат func() - корутины; одновременные вызовы с теми же name и params делят его"""
+        key = (name, params)
+        task = self._flights.get(key)
+        shared = task is not None
+        if task is None:
+            task = contextvars.copy_context().run(asyncio.ensure_future, self._execute(func))
+            self._flights[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        self._count(name, shared)
+        return await asyncio.shield(task)
+
+    async def _execute(self, func):
+        """func() в контексте задачи: соединение с БД берется из пула отдельно от запросов
+        и возвращается в пул по завершении вычисления"""
+        if self.database is None:
+            return await func()
+        self.database._state.reset_context()
+        try:
+            return await func()
+        finally:
+            if not self.database.is_closed():
+                self.database.close()
+
+    def _finish(self, key: tuple, task) -> None:
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        if not task.cancelled():
+            task.exception()   # Исключение уже получили ожидающие; иначе asyncio предупредит о нем
+
+    def _count(self, name: str, shared: bool) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(name, {'requests': 0, 'executions': 0})
+            stats['requests'] += 1
+            stats['executions'] += not shared
+
+    def stats(self) -> dict:
+        """По эндпоинтам: запросов, выполненных вычислений, доля запросов, получивших чужой результат"""
+        with self._lock:
+            return {name: {**stats,
+                           'in_flight': sum(1 for key in self._flights if key[0] == name),
+                           'collapse_ratio': round(1 - stats['executions'] / stats['requests'], 3)}
+                    for name, stats in sorted(self._stats.items())}
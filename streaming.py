@@ -0,0 +1,64 @@
+"""Потоковая выдача больших ответов: JSON-массив, NDJSON и CSV по частям"""
+from datetime import date, datetime
+from fastapi.responses import StreamingResponse
+from fast_json import dumps
+import csv
+import io
+
+CHUNK_ROWS = 1000   # Строк в одной отправляемой части
+
+
+def _plain(value):
+    """Значение для NDJSON/CSV: даты в ISO 8601"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def json_array_stream(items):
+    """Отдает JSON-массив по частям, не собирая его целиком в памяти"""
+    yield b'['
+    for i, item in enumerate(items):
+        yield (b',' if i else b'') + dumps(item)
+    yield b']'
+
+def ndjson_stream(columns: list, rows):
+    """Строки-кортежи как NDJSON: один JSON-объект с ключами columns на строку"""
+    lines = []
+    for row in rows:
+        lines.append(dumps(dict(zip(columns, row))))
+        if len(lines) >= CHUNK_ROWS:
+            yield b'\n'.join(lines) + b'\n'
+            lines = []
+    if lines:
+        yield b'\n'.join(lines) + b'\n'
+
+def csv_stream(columns: list, rows):
+    """Строки-кортежи как CSV с заголовком; BOM в начале, чтобы Excel открыл UTF-8"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow(['' if value is None else _plain(value) for value in row])
+        count += 1
+        if count >= CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            count = 0
+    yield buffer.getvalue()
+
+EXPORT_FORMATS = {
+    'ndjson': (ndjson_stream, 'application/x-ndjson', 'ndjson'),
+    'csv': (csv_stream, 'text/csv; charset=utf-8', 'csv'),
+}
+
+def export_response(export_format: str, columns: list, rows, filename: str) -> StreamingResponse:
+    """Потоковый ответ-файл в формате ndjson или csv"""
+    stream, media_type, extension = EXPORT_FORMATS[export_format]
+    return StreamingResponse(
+        stream(columns, rows),
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="{filename}.{extension}"'}
+    )
@@ -0,0 +1,65 @@
+"""Общие фикстуры тестов: приложение на временной базе SQLite вместо MySQL
+
+Подменяет database.db_connection до импорта models и api, поэтому модели и обработчики
+работают с тестовой базой; запросы к ней учитываются query_recorder так же, как в рабочей БД.
+"""
+from playhouse.pool import PooledSqliteDatabase
+from fastapi.testclient import TestClient
+import os
+import sys
+import tempfile
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ADMIN_EMAIL = 'admin@mail.ru'
+ADMIN_PASSWORD = 'admin'
+
+os.environ.update({
+    'ADMIN_EMAIL': ADMIN_EMAIL,
+    'ADMIN_PHONE': '+79990000000',
+    'ADMIN_PASSWORD': ADMIN_PASSWORD,
+    'PASSWORD_KDF_ITERATIONS': '1000',   # Быстрое хеширование паролей в тестах
+    'SESSION_BACKEND': 'database',
+    'TOKEN_MODE': 'opaque',
+    'ASYNC_DB_DRIVER': 'threadpool',
+})
+
+import database
+
+
+class SqliteTestDatabase(database.MonitoredPoolMixin, PooledSqliteDatabase):
+    """Пул SQLite с теми же метриками, учетом запросов и состоянием соединения, что у рабочей БД"""
+
+
+_db_dir = tempfile.TemporaryDirectory()
+database.db_connection = SqliteTestDatabase(
+    os.path.join(_db_dir.name, 'test.db'),
+    max_connections=20,
+    stale_timeout=300,
+    timeout=10,
+    pragmas={'journal_mode': 'wal'},
+    check_same_thread=False
+)
+
+import models
+import api
+
+with database.db_connection.connection_context():
+    models.initialize_tables()
+    models.seed_database()
+
+
+@pytest.fixture(scope='session')
+def client():
+    """Клиент приложения; lifespan (фоновые задачи, справочники) выполняется на время сессии"""
+    with TestClient(api.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope='session')
+def admin_token(client) -> str:
+    """Токен администратора"""
+    response = client.post('/users/auth/', json={'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD})
+    assert response.status_code == 200, response.text
+    return response.json()['token']
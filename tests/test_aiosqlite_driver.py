@@ -0,0 +1,63 @@
+"""Асинхронные обработчики на драйвере aiosqlite (замена aiomysql в тестах и локальной разработке)"""
+from fastapi.testclient import TestClient
+from database import db_connection
+from models import Bookings, StatusBooking
+from async_db import AioSQLiteDriver
+import os
+import pytest
+import api
+
+
+@pytest.fixture(scope='module')
+def aiosqlite_client(client):
+    """Приложение, работающее с тестовой базой через aiosqlite (ASYNC_DB_DRIVER=aiosqlite)"""
+    previous, path = api.async_db, os.environ.get('ASYNC_DB_SQLITE_PATH')
+    os.environ['ASYNC_DB_SQLITE_PATH'] = db_connection.database
+    api.async_db = api.create_async_driver('aiosqlite')
+    try:
+        with TestClient(api.app) as test_client:   # lifespan подключает драйвер
+            yield test_client
+    finally:
+        api.async_db = previous
+        if path is None:
+            os.environ.pop('ASYNC_DB_SQLITE_PATH')
+        else:
+            os.environ['ASYNC_DB_SQLITE_PATH'] = path
+
+
+def test_driver_is_aiosqlite(aiosqlite_client):
+    assert isinstance(api.async_db, AioSQLiteDriver)
+
+
+def test_tours_and_destination_search(aiosqlite_client, admin_token):
+    api.token_cache.clear()   # Сессия читается через драйвер
+    api.tour_catalog.invalidate()
+    api.destination_search.invalidate()
+    headers = {'token': admin_token}
+
+    tours = aiosqlite_client.get('/tours/get_tours/', headers=headers)
+    assert tours.status_code == 200, tours.text
+    assert 'Отдых в Сочи' in tours.text
+
+    found = aiosqlite_client.get('/destinations/search/', params={'city': 'Сочи'}, headers=headers)
+    assert found.status_code == 200, found.text
+    assert 'Сочи' in found.text
+
+
+def test_booking_and_payment(aiosqlite_client, admin_token):
+    api.token_cache.clear()
+    headers = {'token': admin_token}
+    booking = aiosqlite_client.post('/booking/create_booking/', headers=headers, json={
+        'birthday': '1990-01-01', 'tour_name': 'Горный Алтай', 'number_of_people': 2})
+    assert booking.status_code == 200, booking.text
+    booking_number = booking.json()['Номер заявки']
+
+    payment = aiosqlite_client.post('/payments/add_payment/', headers=headers, json={
+        'booking_number': booking_number, 'method_name': 'Наличные', 'payment_status_name': 'Оплачено'})
+    assert payment.status_code == 200, payment.text
+    assert payment.json()['amount'] == 2 * 18000
+
+    with db_connection.connection_context():
+        status = (StatusBooking.select(StatusBooking.status_name).join(Bookings)
+                  .where(Bookings.booking_number == booking_number).scalar())
+    assert status == 'Оплачено'
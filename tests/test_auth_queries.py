@@ -0,0 +1,24 @@
+"""Число запросов к БД на аутентификацию запроса: кэш токенов избавляет от них
+
+/users/me/ сам читает профиль одним запросом, все остальное - аутентификация.
+"""
+from query_recorder import assert_max_queries
+import api
+
+PROFILE_QUERIES = 1
+
+
+def test_token_cache_miss_reads_session_once(client, admin_token):
+    api.token_cache.clear()
+    with assert_max_queries(PROFILE_QUERIES + 1) as captured:
+        response = client.get('/users/me/', params={'token': admin_token})
+    assert response.status_code == 200, response.text
+    assert captured.count == PROFILE_QUERIES + 1
+
+
+def test_token_cache_hit_makes_no_auth_queries(client, admin_token):
+    client.get('/users/me/', params={'token': admin_token})
+    with assert_max_queries(PROFILE_QUERIES) as captured:
+        response = client.get('/users/me/', params={'token': admin_token})
+    assert response.status_code == 200, response.text
+    assert captured.count == PROFILE_QUERIES
@@ -0,0 +1,31 @@
+"""Условные GET-запросы: ETag по телу ответа и 304 без тела"""
+from conditional import make_etag
+from database import db_connection
+from models import PaymentsMethods
+
+URL = '/payment_methods/get_all_methods/'
+
+
+def test_etag_is_content_hash_and_not_modified_has_no_body(client, admin_token):
+    headers = {'token': admin_token}
+    response = client.get(URL, headers=headers)
+    assert response.status_code == 200, response.text
+    etag = response.headers['etag']
+    assert etag == make_etag(response.content)
+
+    response = client.get(URL, headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.content == b''
+    assert response.headers['etag'] == etag
+
+
+def test_change_made_outside_this_process_changes_etag(client, admin_token):
+    headers = {'token': admin_token}
+    etag = client.get(URL, headers=headers).headers['etag']
+    with db_connection.connection_context():   # Как запись другого процесса API: мимо HTTP-запросов
+        PaymentsMethods.create(method_name='Тестовый способ оплаты')
+
+    response = client.get(URL, headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['etag'] != etag
+    assert 'Тестовый способ оплаты' in response.text
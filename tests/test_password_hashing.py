@@ -0,0 +1,38 @@
+"""Хеширование паролей не держит соединение с БД: во время него соединение запроса возвращено в пул"""
+from database import db_connection
+import api
+import pytest
+from conftest import ADMIN_EMAIL, ADMIN_PASSWORD
+
+
+@pytest.fixture
+def connections_during_hashing(monkeypatch):
+    """Число выданных соединений пула в момент каждого вызова хеширования"""
+    in_use = []
+    hasher = api.password_hasher
+    hash_password, verify_password = hasher.hash, hasher.verify
+
+    async def hash_spy(*args):
+        in_use.append(len(db_connection._in_use))
+        return await hash_password(*args)
+
+    async def verify_spy(*args):
+        in_use.append(len(db_connection._in_use))
+        return await verify_password(*args)
+
+    monkeypatch.setattr(hasher, 'hash', hash_spy)
+    monkeypatch.setattr(hasher, 'verify', verify_spy)
+    return in_use
+
+
+def test_login_releases_connection_while_verifying(client, connections_during_hashing):
+    response = client.post('/users/auth/', json={'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD})
+    assert response.status_code == 200, response.text
+    assert connections_during_hashing == [0]
+
+
+def test_register_releases_connection_while_hashing(client, connections_during_hashing):
+    response = client.post('/users/register/', params={'email': 'hashing@mail.ru', 'password': 'secret',
+                                                       'full_name': 'Тест', 'number_phone': '+79990000001'})
+    assert response.status_code == 200, response.text
+    assert connections_during_hashing == [0]
@@ -0,0 +1,22 @@
+"""Список платежей читается одним запросом (плюс поиск токена) при любом числе строк"""
+from query_recorder import assert_max_queries
+from database import db_connection
+import pytest
+import api
+import models
+
+LISTING_QUERIES = 1   # Платежи вместе с бронированием, способом и статусом оплаты - одним JOIN
+AUTH_QUERIES = 1      # Поиск сессии по токену (кэш токенов очищен)
+
+
+@pytest.mark.parametrize('bookings', [10, 300])
+def test_payments_listing_query_count_is_constant(client, admin_token, bookings):
+    with db_connection.connection_context():
+        models.seed_synthetic(users=5, bookings=bookings, paid_ratio=1.0)
+    api.token_cache.clear()
+    with assert_max_queries(LISTING_QUERIES + AUTH_QUERIES) as captured:
+        response = client.get('/payments/get_all_payments/', params={'limit': 1000},
+                              headers={'token': admin_token})
+    assert response.status_code == 200, response.text
+    assert len(response.json()) >= bookings
+    assert captured.count == LISTING_QUERIES + AUTH_QUERIES
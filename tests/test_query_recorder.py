@@ -0,0 +1,59 @@
+"""Учет запросов к БД: бюджет обработчика в строгом режиме и подозрение на N+1"""
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from database import db_connection, ConnectionPerRequestMiddleware
+from models import Tours
+from query_recorder import QueryMetrics, QueryRecorderMiddleware, QueryBudgetExceeded, query_budget
+import pytest
+import api
+
+
+def make_client(metrics: QueryMetrics, strict: bool = False) -> TestClient:
+    """Приложение с тем же учетом запросов, что у API, и двумя обработчиками"""
+    app = FastAPI()
+    app.add_middleware(ConnectionPerRequestMiddleware, database=db_connection)
+    app.add_middleware(QueryRecorderMiddleware, metrics=metrics, strict=strict)
+
+    @app.get('/within_budget/')
+    @query_budget(1)
+    def within_budget():
+        return {'tours': Tours.select().count()}
+
+    @app.get('/n_plus_one/')
+    @query_budget(1)
+    def n_plus_one():
+        ids = [tour_id for tour_id, in Tours.select(Tours.id).tuples()]
+        return {'names': [Tours.get_by_id(tour_id).name for tour_id in ids]}
+
+    return TestClient(app)
+
+
+def test_budget_exceeded_fails_request_in_strict_mode():
+    client = make_client(QueryMetrics(), strict=True)
+    assert client.get('/within_budget/').status_code == 200
+    with pytest.raises(QueryBudgetExceeded):
+        client.get('/n_plus_one/')
+
+
+def test_budget_exceeded_and_n_plus_one_are_counted():
+    metrics = QueryMetrics(repeat_threshold=3)
+    client = make_client(metrics)
+    client.get('/within_budget/')
+    assert client.get('/n_plus_one/').status_code == 200
+    stats = metrics.stats()
+    assert stats['/within_budget/']['budget_exceeded'] == 0
+    assert stats['/within_budget/']['n_plus_one'] == 0
+    assert stats['/n_plus_one/']['budget_exceeded'] == 1
+    assert stats['/n_plus_one/']['n_plus_one'] == 1
+
+
+@pytest.mark.parametrize('url', ['/tours/get_tours/', '/destinations/search/'])
+def test_single_flight_endpoints_queries_are_budgeted(client, admin_token, url):
+    client.get('/users/me/', params={'token': admin_token})   # Токен в кэше: проверка без запросов к БД
+    api.tour_catalog.invalidate()
+    api.destination_search.invalidate()
+    response = client.get(url, headers={'token': admin_token})
+    assert response.status_code == 200, response.text
+    route = api.query_metrics.stats()[url]
+    assert route['max_queries'] > 0   # Запросы общего вычисления учтены, бюджет обработчика проверяется
+    assert route['budget_exceeded'] == 0
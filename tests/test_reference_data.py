@@ -0,0 +1,13 @@
+"""Справочники в памяти: название, добавленное другим процессом, находится без ожидания ttl"""
+from database import db_connection
+from models import StatusBooking
+from reference_data import ReferenceTable
+
+
+def test_missing_name_is_reread_from_database():
+    statuses = ReferenceTable(StatusBooking, StatusBooking.status_name, ttl=300)
+    with db_connection.connection_context():
+        statuses.load()
+        assert statuses.id_of('Добавлен другим воркером') is None
+        created = StatusBooking.create(status_name='Добавлен другим воркером')   # Мимо invalidate
+        assert statuses.id_of('Добавлен другим воркером') == created.id
@@ -0,0 +1,24 @@
+"""Метрики подсистем API: доступны администратору, без запросов к БД"""
+from query_recorder import assert_max_queries
+
+URL = '/service/metrics/'
+
+
+def test_metrics_for_admin(client, admin_token):
+    client.get('/users/me/', params={'token': admin_token})   # Токен в кэше: проверка без запросов к БД
+    with assert_max_queries(0):
+        response = client.get(URL, headers={'token': admin_token})
+    assert response.status_code == 200, response.text
+    metrics = response.json()
+    assert {'password_hashing', 'database_pool', 'queries', 'tour_catalog',
+            'single_flight', 'destination_search'} <= metrics.keys()
+    assert metrics['database_pool']['in_use'] == 0   # Соединения предыдущих запросов возвращены в пул
+    assert metrics['database_pool']['checkouts'] > 0
+
+
+def test_metrics_require_admin(client):
+    response = client.post('/users/register/', params={'email': 'metrics@mail.ru', 'password': 'secret',
+                                                       'full_name': 'Тест', 'number_phone': '+79990000002'})
+    assert response.status_code == 200, response.text
+    token = client.post('/users/auth/', json={'email': 'metrics@mail.ru', 'password': 'secret'}).json()['token']
+    assert client.get(URL, headers={'token': token}).status_code == 403
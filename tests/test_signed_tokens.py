@@ -0,0 +1,37 @@
+"""Отзыв подписанных токенов: выход на одном устройстве не затрагивает остальные"""
+from datetime import datetime, timedelta
+from database import db_connection
+from signed_tokens import TokenSigner, RevocationList
+import signed_tokens
+
+
+class FrozenDatetime(datetime):
+    """Время не идет: оба входа - в одну миллисекунду"""
+    moment = datetime.now()
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.moment
+
+
+def test_revoke_token_logs_out_only_that_device(monkeypatch):
+    signer = TokenSigner({'test': b'secret'})
+    monkeypatch.setattr(signed_tokens, 'datetime', FrozenDatetime)
+    phone, _ = signer.issue(1, 'Пользователь')
+    laptop, _ = signer.issue(1, 'Пользователь')
+    monkeypatch.undo()
+    revocations = RevocationList(max_age=signer.lifetime)
+
+    user, phone_issued_at, phone_jti = signer.verify(phone)
+    _, laptop_issued_at, laptop_jti = signer.verify(laptop)
+    assert phone_issued_at == laptop_issued_at and phone_jti != laptop_jti
+    with db_connection.connection_context():
+        revocations.revoke_token(phone_jti, user.expires_at)
+    assert revocations.is_revoked(user.id, phone_issued_at, phone_jti)
+    assert not revocations.is_revoked(user.id, laptop_issued_at, laptop_jti)
+
+    other_worker = RevocationList(max_age=timedelta(hours=1))
+    with db_connection.connection_context():
+        other_worker.refresh()
+    assert other_worker.is_revoked(user.id, phone_issued_at, phone_jti)
+    assert not other_worker.is_revoked(user.id, laptop_issued_at, laptop_jti)
@@ -0,0 +1,48 @@
+"""Общее вычисление single-flight: свое соединение с БД, не зависящее от запросов-инициаторов"""
+from starlette.concurrency import run_in_threadpool
+from database import db_connection
+from models import Tours
+from single_flight import SingleFlight
+import asyncio
+import api
+
+
+def test_cancelled_initiator_does_not_take_connection_from_shared_task():
+    flights = SingleFlight(db_connection)
+    started = asyncio.Event()
+
+    async def compute():
+        started.set()
+        await asyncio.sleep(0.05)
+        return await run_in_threadpool(lambda: Tours.select().count())
+
+    async def request():
+        db_connection._state.reset_context()   # Как ConnectionPerRequestMiddleware
+        try:
+            return await flights.run('tours', (), compute)
+        finally:
+            if not db_connection.is_closed():
+                db_connection.close()
+
+    async def scenario():
+        first = asyncio.create_task(request())
+        await started.wait()
+        second = asyncio.create_task(request())
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    with db_connection.connection_context():
+        expected = Tours.select().count()
+    assert asyncio.run(scenario()) == expected
+    assert not db_connection._in_use
+    assert flights.stats()['tours']['executions'] == 1
+
+
+def test_shared_work_queries_count_for_initiating_request(client, admin_token):
+    client.get('/users/me/', params={'token': admin_token})   # Токен в кэше: проверка без запросов к БД
+    api.tour_catalog.invalidate()
+    before = api.query_metrics.stats().get('/tours/get_tours/', {}).get('queries', 0)
+    response = client.get('/tours/get_tours/', headers={'token': admin_token})
+    assert response.status_code == 200, response.text
+    assert api.query_metrics.stats()['/tours/get_tours/']['queries'] > before
@@ -0,0 +1,26 @@
+"""Направления тура постранично: сообщение об их отсутствии - только на первой странице"""
+from pagination import encode_cursor
+from database import db_connection
+from models import Tours, TourDestinations
+
+URL = '/tour-destinations/get_by_tour/'
+TOUR = 'Отдых в Сочи'
+
+
+def test_empty_next_page_is_empty_list(client, admin_token):
+    with db_connection.connection_context():
+        last_id = (TourDestinations.select(TourDestinations.id).join(Tours)
+                   .where(Tours.name == TOUR).order_by(TourDestinations.id.desc()).scalar())
+    # Курсор за последней связью - как если бы следующие удалили, пока клиент листал страницы
+    response = client.get(URL, params={'tour_name': TOUR, 'cursor': encode_cursor((last_id,))},
+                          headers={'token': admin_token})
+    assert response.status_code == 200, response.text
+    assert response.json() == []
+
+
+def test_tour_without_destinations_reports_it_on_first_page(client, admin_token):
+    with db_connection.connection_context():
+        Tours.create(name='Тур без направлений', price=1000, days=1, country='Россия')
+    response = client.get(URL, params={'tour_name': 'Тур без направлений'}, headers={'token': admin_token})
+    assert response.status_code == 200, response.text
+    assert response.json() == {'message': 'Для этого тура не найдено направлений'}
@@ -0,0 +1,71 @@
+"""Кэш токенов аутентификации в памяти процесса API"""
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+import threading
+
+
+class CachedToken(NamedTuple):
+    """Данные аутентифицированного пользователя, сохраненные в кэше"""
+    id: int
+    role: str
+    expires_at: datetime
+
+
+class TokenCache:
+    """Ограниченный по размеру кэш токен -> (id пользователя, роль, срок действия) с TTL"""
+
+    def __init__(self, maxsize: int = 10000, ttl: int = 60):
+        self.maxsize = maxsize
+        self.ttl = timedelta(seconds=ttl)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[CachedToken]:
+        """Возвращает запись из кэша или None, если ее нет или TTL истек"""
+        with self._lock:
+            item = self._entries.get(token)
+            if item is None:
+                return None
+            entry, stored_until = item
+            if datetime.now() > stored_until:
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return entry
+
+    def set(self, token: str, entry: CachedToken) -> None:
+        """Сохраняет запись; время хранения не превышает срок действия токена"""
+        stored_until = min(datetime.now() + self.ttl, entry.expires_at)
+        with self._lock:
+            self._entries[token] = (entry, stored_until)
+            self._entries.move_to_end(token)
+            if len(self._entries) > self.maxsize:
+                self._evict()
+
+    def invalidate(self, token: str) -> None:
+        """Удаляет токен из кэша"""
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Удаляет из кэша все токены пользователя"""
+        with self._lock:
+            for token in [t for t, (entry, _) in self._entries.items() if entry.id == user_id]:
+                del self._entries[token]
+
+    def clear(self) -> None:
+        """Полностью очищает кэш"""
+        with self._lock:
+            self._entries.clear()
+
+    def _evict(self) -> None:
+        """Удаляет просроченные записи, затем самые давно использованные"""
+        now = datetime.now()
+        for token in [t for t, (_, stored_until) in self._entries.items() if now > stored_until]:
+            del self._entries[token]
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,50 @@
+"""Отложенная (write-behind) запись продления срока действия токенов"""
+from background import PeriodicTask
+import threading
+
+
+class ExpiryWriter:
+    """Накапливает новые сроки действия токенов в памяти и сохраняет их одной операцией.
+
+    write - функция, принимающая словарь ключ -> новый срок действия
+    и записывающая его в хранилище (например, одним UPDATE ... CASE).
+    """
+
+    def __init__(self, write, interval: int = 30):
+        self.write = write
+        self.interval = interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._task = PeriodicTask('token-expiry-writer', interval, self.flush)
+
+    def touch(self, key, expires_at) -> None:
+        """Запоминает новый срок действия; при interval <= 0 записывает сразу"""
+        if self.interval <= 0:
+            self.write({key: expires_at})
+            return
+        with self._lock:
+            self._pending[key] = expires_at
+
+    def flush(self) -> int:
+        """Записывает все накопленные продления одним запросом"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        try:
+            return self.write(pending)
+        except Exception as e:
+            with self._lock:
+                for key, expires_at in pending.items():
+                    self._pending.setdefault(key, expires_at)
+            print(f'Ошибка при сохранении сроков действия токенов: {e}')
+            return 0
+
+    def start(self) -> None:
+        """Запускает фоновый поток периодической записи"""
+        self._task.start()
+
+    def stop(self) -> None:
+        """Останавливает фоновый поток и записывает оставшиеся продления"""
+        self._task.stop()
+        self.flush()